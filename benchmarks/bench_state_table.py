@@ -0,0 +1,146 @@
+"""Сравнение таблицы состояний с моделью на словарях.
+
+Запуск: python benchmarks/bench_state_table.py [число пользователей]
+"""
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from os.path import abspath, dirname
+
+sys.path.append(dirname(dirname(abspath(__file__))))
+
+from memory import current_rss  # noqa: E402
+from state_table import StateTable  # noqa: E402
+
+STATUSES = ('approved', 'reviewing', 'rejected')
+LOAD_FLAG = '--load'
+
+
+def build_rows(count):
+    """Генерирует строки (id, статус, курсор, время опроса).
+
+    Пользователи идут в случайном порядке, как при подключении к боту.
+    """
+    rows = [
+        (number * 7919, STATUSES[number % 3], 1600000000 + number,
+         1700000000.0 + number)
+        for number in range(count)
+    ]
+    random.Random(0).shuffle(rows)
+    return rows
+
+
+def measure(build):
+    """Возвращает результат build, прирост памяти и время выполнения.
+
+    Время меряется отдельным запуском без tracemalloc.
+    """
+    gc.collect()
+    started = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size, elapsed
+
+
+def dict_model(rows):
+    """Состояние словарем словарей, как развитие response_status_glob."""
+    return {
+        str(tenant): {'status': status, 'cursor': cursor,
+                      'next_poll': next_poll}
+        for tenant, status, cursor, next_poll in rows
+    }
+
+
+def table_model(rows):
+    """Состояние в колонках StateTable, через add, как в боте."""
+    table = StateTable(STATUSES)
+    for tenant, status, cursor, next_poll in rows:
+        table.add(tenant, status, cursor, next_poll)
+    return table
+
+
+def load(model, path):
+    """Загружает снимок и печатает прирост RSS и время загрузки.
+
+    Запускается в отдельном процессе: tracemalloc не видит страниц,
+    отображенных через mmap, поэтому память меряется по RSS.
+    """
+    gc.collect()
+    baseline = current_rss()
+    started = time.perf_counter()
+    if model == 'dict':
+        with open(path) as snapshot:
+            state = json.load(snapshot)
+        elapsed = time.perf_counter() - started
+        loaded = current_rss() - baseline
+        scan = sum(row['cursor'] for row in state.values())
+    else:
+        state = StateTable.load(path, STATUSES)
+        elapsed = time.perf_counter() - started
+        loaded = current_rss() - baseline
+        scan = sum(row[2] for row in state.rows())
+    scanned = current_rss() - baseline
+    print(json.dumps({'loaded': loaded, 'scanned': scanned,
+                      'elapsed': elapsed, 'scan': scan}))
+
+
+def load_in_child(model, path):
+    """Меряет загрузку снимка в чистом процессе."""
+    output = subprocess.run(
+        [sys.executable, abspath(__file__), LOAD_FLAG, model, path],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    """Печатает память и время загрузки для обеих моделей."""
+    if len(sys.argv) > 1 and sys.argv[1] == LOAD_FLAG:
+        load(sys.argv[2], sys.argv[3])
+        return
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rows = build_rows(count)
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, 'state.json')
+        table_path = os.path.join(directory, 'state.bin')
+
+        state, dict_memory, dict_build = measure(lambda: dict_model(rows))
+        with open(json_path, 'w') as snapshot:
+            json.dump(state, snapshot)
+        del state
+        table, table_memory, table_build = measure(lambda: table_model(rows))
+        table.snapshot(table_path)
+        assert table.get(7919) == (STATUSES[1], 1600000001, 1700000001.0)
+        del table
+
+        dict_loaded = load_in_child('dict', json_path)
+        table_loaded = load_in_child('table', table_path)
+        assert dict_loaded['scan'] == table_loaded['scan']
+
+    print(f'Пользователей: {count}')
+    print(f'{"модель":<12}{"память, КБ":>12}{"заполнение, мс":>16}'
+          f'{"RSS загрузки, КБ":>18}{"RSS обхода, КБ":>16}'
+          f'{"загрузка, мс":>14}')
+    for name, memory, build, loaded in (
+        ('dict', dict_memory, dict_build, dict_loaded),
+        ('StateTable', table_memory, table_build, table_loaded),
+    ):
+        print(f'{name:<12}{memory // 1024:>12}{build * 1000:>16.1f}'
+              f'{loaded["loaded"] // 1024:>18}'
+              f'{loaded["scanned"] // 1024:>16}'
+              f'{loaded["elapsed"] * 1000:>14.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+import logging
+import time
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Перестает обращаться к API после серии ошибок подряд."""
+
+    def __init__(self, failure_threshold: int = 5,
+                 reset_timeout: float = 1800,
+                 clock: Callable[[], float] = time.time):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self) -> str:
+        """Текущее состояние: closed, open или half_open."""
+        if self.opened_at is None:
+            return CLOSED
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return OPEN
+
+    def allow(self) -> bool:
+        """Можно ли сейчас обращаться к API."""
+        return self.state != OPEN
+
+    def success(self) -> None:
+        """Запрос прошел успешно, замыкаем цепь."""
+        if self.opened_at is not None:
+            logger.info('Связь с API восстановлена')
+        self.failures = 0
+        self.opened_at = None
+
+    def failure(self) -> None:
+        """Запрос завершился ошибкой."""
+        self.failures += 1
+        if self.state == HALF_OPEN or (
+            self.opened_at is None
+            and self.failures >= self.failure_threshold
+        ):
+            logger.warning(f'API недоступно {self.failures} раз подряд, '
+                           f'пауза {self.reset_timeout} с.')
+            self.opened_at = self.clock()
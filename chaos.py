@@ -0,0 +1,413 @@
+import argparse
+import json
+import logging
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os.path import join
+from typing import List, Optional
+
+from notifiers import FanOut, Notifier
+from outbox import RETRY_MAX
+
+logger = logging.getLogger(__name__)
+
+TIMELINE = ('reviewing', 'rejected', 'reviewing', 'approved')
+FAULTS = ('latency', 'reset', 'malformed_json', 'missing_homeworks',
+          'missing_current_date', 'unknown_status')
+DELIVERY_FAULTS = ('delivery_failure', 'late_delivery')
+TENANT = 'chaos'
+DRAIN_ROUNDS = 20
+
+
+@dataclass
+class ChaosConfig:
+    """Частоты сбоев фейкового API и канала доставки (доля от 0 до 1)."""
+
+    latency: float = 0.0
+    reset: float = 0.0
+    malformed_json: float = 0.0
+    missing_homeworks: float = 0.0
+    missing_current_date: float = 0.0
+    unknown_status: float = 0.0
+    delivery_failure: float = 0.0
+    late_delivery: float = 0.0
+    latency_seconds: float = 0.3
+    timeout: float = 0.1
+    notify_timeout: float = 0.05
+    cycles: int = 200
+    status_every: int = 10
+    poll_interval: float = 600
+    seed: int = 0
+
+
+@dataclass
+class ChaosThresholds:
+    """Допустимые пределы для прохождения прогона."""
+
+    max_recovery_seconds: float = 3600
+    max_wasted_ratio: float = 0.5
+    max_lost: int = 0
+    max_duplicates: int = 0
+
+
+@dataclass
+class ChaosReport:
+    """Результат прогона конвейера опроса под сбоями."""
+
+    requests: int = 0
+    wasted_requests: int = 0
+    skipped_polls: int = 0
+    breaker_opens: int = 0
+    faults: dict = field(default_factory=dict)
+    recoveries: List[float] = field(default_factory=list)
+    expected: int = 0
+    delivered: int = 0
+    lost: int = 0
+    duplicates: int = 0
+
+    @property
+    def max_recovery_seconds(self) -> float:
+        """Самое долгое восстановление по часам конвейера."""
+        return max(self.recoveries, default=0.0)
+
+    @property
+    def wasted_ratio(self) -> float:
+        """Доля запросов, не давших результата."""
+        return self.wasted_requests / self.requests if self.requests else 0.0
+
+    def failures(self, thresholds: ChaosThresholds) -> List[str]:
+        """Список нарушенных порогов."""
+        checks = (
+            (self.max_recovery_seconds > thresholds.max_recovery_seconds,
+             f'восстановление {self.max_recovery_seconds:.0f} с'),
+            (self.wasted_ratio > thresholds.max_wasted_ratio,
+             f'потрачено впустую {self.wasted_ratio:.0%} запросов'),
+            (self.lost > thresholds.max_lost,
+             f'потеряно уведомлений: {self.lost}'),
+            (self.duplicates > thresholds.max_duplicates,
+             f'дубликатов уведомлений: {self.duplicates}'),
+        )
+        return [message for failed, message in checks if failed]
+
+    def passed(self, thresholds: ChaosThresholds) -> bool:
+        """Уложился ли прогон в пороги."""
+        return not self.failures(thresholds)
+
+
+class ChaosClock:
+    """Часы конвейера: идут только по циклам опроса и ожиданиям лимита."""
+
+    def __init__(self, now: Optional[float] = None):
+        self.now = time.time() if now is None else now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        """Переводит часы вперед вместо ожидания."""
+        self.now += seconds
+
+
+class FakeApi:
+    """Локальный API Практикума, отвечающий со сбоями."""
+
+    def __init__(self, config: ChaosConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.homework = {}
+        self.requests = 0
+        self.faults = dict.fromkeys(FAULTS, 0)
+        self.server = ThreadingHTTPServer(
+            ('127.0.0.1', 0), self.make_handler()
+        )
+        self.server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        """Адрес эндпоинта фейкового API."""
+        return f'http://127.0.0.1:{self.server.server_port}/'
+
+    def start(self) -> None:
+        """Запускает сервер в фоновом потоке."""
+        threading.Thread(
+            target=self.server.serve_forever, name='chaos-api', daemon=True
+        ).start()
+
+    def stop(self) -> None:
+        """Останавливает сервер."""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def pick_fault(self) -> Optional[str]:
+        """Выбирает сбой для очередного запроса."""
+        with self.lock:
+            self.requests += 1
+            roll = self.random.random()
+            for fault in FAULTS:
+                rate = getattr(self.config, fault)
+                if roll < rate:
+                    self.faults[fault] += 1
+                    return fault
+                roll -= rate
+        return None
+
+    def body(self, fault: Optional[str]) -> bytes:
+        """Тело ответа с учетом сбоя."""
+        if fault == 'malformed_json':
+            return b'{"homeworks": [{"status": '
+        homework = dict(self.homework)
+        if fault == 'unknown_status':
+            homework['status'] = 'unknown'
+        data = {'homeworks': [homework], 'current_date': int(time.time())}
+        if fault == 'missing_homeworks':
+            del data['homeworks']
+        if fault == 'missing_current_date':
+            del data['current_date']
+        return json.dumps(data).encode()
+
+    def make_handler(self):
+        """Создает обработчик запросов с доступом к состоянию API."""
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                """Отвечает текущим статусом или сбоем."""
+                fault = api.pick_fault()
+                if fault == 'reset':
+                    self.close_connection = True
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                    return
+                if fault == 'latency':
+                    time.sleep(api.config.latency_seconds)
+                body = api.body(fault)
+                try:
+                    self.send_response(HTTPStatus.OK)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class ChaosNotifier(Notifier):
+    """Канал доставки, который отказывает или опаздывает с заданной частотой.
+
+    Запоминает ключи всех действительно отправленных сообщений, в том
+    числе доставленных после истечения срока.
+    """
+
+    name = 'telegram'
+
+    def __init__(self, config: ChaosConfig):
+        super().__init__(timeout=config.notify_timeout, retries=0)
+        self.config = config
+        self.random = random.Random(config.seed + 1)
+        self.lock = threading.Lock()
+        self.sent = []
+        self.faults = dict.fromkeys(DELIVERY_FAULTS, 0)
+
+    def pick_fault(self) -> Optional[str]:
+        """Выбирает сбой для очередной доставки."""
+        with self.lock:
+            roll = self.random.random()
+            for fault in DELIVERY_FAULTS:
+                rate = getattr(self.config, fault)
+                if roll < rate:
+                    self.faults[fault] += 1
+                    return fault
+                roll -= rate
+        return None
+
+    def deliver(self, message: str, key: str) -> None:
+        """Доставляет сообщение, отказывая или опаздывая при сбое."""
+        fault = self.pick_fault()
+        if fault == 'delivery_failure':
+            raise ConnectionError('Канал доставки недоступен')
+        if fault == 'late_delivery':
+            time.sleep(self.deadline * 2)
+        with self.lock:
+            self.sent.append(key)
+
+
+def run_chaos(config: ChaosConfig, api: FakeApi) -> ChaosReport:
+    """Гоняет конвейер опроса против фейкового API и собирает метрики.
+
+    Опросы идут через homework.run_due_polls, как в боте, на общих
+    часах, которые сдвигаются на poll_interval за цикл. Время
+    восстановления считается по этим часам и учитывает паузу
+    разомкнутой цепи. Уведомления доставляются через FanOut в канал
+    ChaosNotifier, после прогона очередь outbox дочищается.
+
+    api должен быть запущен, а homework.ENDPOINT и
+    homework.REQUEST_TIMEOUT указывать на него.
+    """
+    import homework
+    from breaker import CircuitBreaker
+    from fingerprints import PayloadFingerprints
+    from governor import RequestGovernor
+    from health import HealthMonitor
+    from history import HistoryStore
+    from outbox import Outbox, OutboxDispatcher, make_key
+    from scheduler import PollScheduler
+    from state_table import StateTable
+
+    report = ChaosReport()
+    clock = ChaosClock()
+    notifier = ChaosNotifier(config)
+    fanout = FanOut([notifier])
+    notifications = {}
+    monitor = HealthMonitor(homework.HEALTH_LAG_THRESHOLD, clock=clock)
+    table = StateTable(homework.HOMEWORK_STATUSES)
+    scheduler = PollScheduler(
+        config.poll_interval, config.poll_interval / 2, clock=clock,
+        on_schedule=homework.track_schedule(table, monitor)
+    )
+    homework.restore_schedule(table, scheduler, [TENANT], 0)
+    state = {'failing_since': None, 'requests': 0}
+
+    def observe(tenant: str, error: Optional[Exception]) -> None:
+        if error is not None:
+            logger.debug(f'Опрос {tenant}: {error}')
+            report.wasted_requests += api.requests - state['requests']
+            if state['failing_since'] is None:
+                state['failing_since'] = clock()
+        elif state['failing_since'] is not None:
+            report.recoveries.append(clock() - state['failing_since'])
+            state['failing_since'] = None
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            path = join(directory, 'chaos.sqlite3')
+            outbox = Outbox(path, clock=clock, channels=fanout.channels)
+            history = HistoryStore(path, clock=clock)
+            breaker = CircuitBreaker(
+                homework.BREAKER_THRESHOLD, homework.BREAKER_RESET,
+                clock=clock
+            )
+            pipeline = homework.Pipeline(
+                outbox, history, OutboxDispatcher(outbox, fanout.deliver),
+                scheduler, table, monitor, breaker, PayloadFingerprints(),
+                RequestGovernor(homework.API_MAX_RATE, homework.API_BURST,
+                                clock=clock, sleep=clock.sleep)
+            )
+            opened_at = None
+            for cycle in range(config.cycles):
+                step = cycle // config.status_every
+                api.homework = {
+                    'id': step // len(TIMELINE),
+                    'homework_name': f'hw{step // len(TIMELINE)}',
+                    'status': TIMELINE[step % len(TIMELINE)],
+                    'date_updated': time.strftime(
+                        '%Y-%m-%dT%H:%M:%SZ', time.gmtime(step * 3600)
+                    ),
+                }
+                key = make_key(TENANT, api.homework, api.homework['status'])
+                notifications[f'{key}:{notifier.name}'] = (
+                    api.homework['homework_name'], api.homework['status'],
+                    api.homework['date_updated']
+                )
+                state['requests'] = api.requests
+                skipped = homework.run_due_polls(pipeline, observe)
+                report.skipped_polls += skipped
+                if skipped and state['failing_since'] is None:
+                    state['failing_since'] = clock()
+                if breaker.opened_at not in (None, opened_at):
+                    report.breaker_opens += 1
+                opened_at = breaker.opened_at
+                pipeline.dispatcher.dispatch()
+                clock.sleep(config.poll_interval)
+            if state['failing_since'] is not None:
+                report.recoveries.append(clock() - state['failing_since'])
+            for _ in range(DRAIN_ROUNDS):
+                if not outbox.stats()['depth']:
+                    break
+                time.sleep(notifier.deadline)
+                clock.sleep(RETRY_MAX)
+                pipeline.dispatcher.dispatch()
+            outbox.close()
+            history.close()
+    finally:
+        fanout.shutdown()
+
+    expected = set(notifications.values())
+    delivered = Counter(notifications[key] for key in notifier.sent)
+    report.requests = api.requests
+    report.faults = {**api.faults, **notifier.faults}
+    report.expected = len(expected)
+    report.delivered = sum(delivered.values())
+    report.lost = len(expected - set(delivered))
+    report.duplicates = sum(count - 1 for count in delivered.values())
+    return report
+
+
+def main(argv: Optional[list] = None) -> int:
+    """Запускает прогон из командной строки, возвращает код выхода.
+
+    Направляет опрос homework на фейковый API до конца процесса.
+    """
+    parser = argparse.ArgumentParser(
+        description='Прогон конвейера опроса под сбоями API.'
+    )
+    for fault in FAULTS:
+        parser.add_argument(f'--{fault.replace("_", "-")}', type=float,
+                            default=0.05, help='доля запросов со сбоем')
+    for fault in DELIVERY_FAULTS:
+        parser.add_argument(f'--{fault.replace("_", "-")}', type=float,
+                            default=0.05, help='доля доставок со сбоем')
+    parser.add_argument('--notify-timeout', type=float, default=0.05)
+    parser.add_argument('--cycles', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-recovery-seconds', type=float, default=3600)
+    parser.add_argument('--max-wasted-ratio', type=float, default=0.5)
+    args = parser.parse_args(argv)
+    config = ChaosConfig(
+        cycles=args.cycles, seed=args.seed,
+        notify_timeout=args.notify_timeout,
+        **{fault: getattr(args, fault) for fault in FAULTS + DELIVERY_FAULTS}
+    )
+    thresholds = ChaosThresholds(
+        max_recovery_seconds=args.max_recovery_seconds,
+        max_wasted_ratio=args.max_wasted_ratio
+    )
+    import homework
+
+    api = FakeApi(config)
+    homework.ENDPOINT, homework.REQUEST_TIMEOUT = api.url, config.timeout
+    api.start()
+    try:
+        report = run_chaos(config, api)
+    finally:
+        api.stop()
+    print(f'Запросов: {report.requests}, впустую: {report.wasted_requests} '
+          f'({report.wasted_ratio:.0%})')
+    print(f'Сбои: {report.faults}')
+    print(f'Восстановление: до {report.max_recovery_seconds:.0f} с, '
+          f'размыканий цепи: {report.breaker_opens}, пропущено опросов: '
+          f'{report.skipped_polls}')
+    print(f'Уведомлений: ожидалось {report.expected}, отправлено '
+          f'{report.delivered}, потеряно {report.lost}, '
+          f'дубликатов {report.duplicates}')
+    failures = report.failures(thresholds)
+    for failure in failures:
+        print(f'Порог нарушен: {failure}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
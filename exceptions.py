@@ -1,3 +1,21 @@
 
 class BadReturnAnswer(Exception):
     pass
+
+
+class ApiUnavailable(Exception):
+    pass
+
+
+class ServerError(BadReturnAnswer):
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TooManyRequests(BadReturnAnswer):
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
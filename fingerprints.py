@@ -0,0 +1,68 @@
+import hashlib
+import re
+from http import HTTPStatus
+from typing import Optional
+
+from memory import BoundedCache
+
+# current_date меняется в каждом ответе, поэтому в отпечаток не входит
+CURRENT_DATE = re.compile(rb'"current_date"\s*:\s*-?\d+')
+
+
+class PayloadFingerprints:
+    """Отпечатки последних ответов API по каждому пользователю.
+
+    Если ответ не изменился (304 на If-None-Match или тот же хэш тела),
+    его разбор, проверка и сравнение статусов пропускаются.
+    """
+
+    def __init__(self, cache: Optional[BoundedCache] = None):
+        self.cache = cache if cache is not None else BoundedCache()
+        self.hits = 0
+        self.misses = 0
+        self.slow_path_cpu = 0.0
+
+    def headers(self, tenant: str) -> dict:
+        """Заголовки условного запроса, если сервер присылал ETag."""
+        etag, _ = self.cache.get(tenant, (None, None))
+        return {'If-None-Match': etag} if etag else {}
+
+    @staticmethod
+    def digest(response) -> Optional[bytes]:
+        """Хэш сырого тела ответа без поля current_date."""
+        content = getattr(response, 'content', None)
+        if not isinstance(content, bytes):
+            return None
+        return hashlib.blake2b(
+            CURRENT_DATE.sub(b'', content), digest_size=16
+        ).digest()
+
+    def unchanged(self, tenant: str, response) -> bool:
+        """Проверяет, совпадает ли ответ с последним обработанным."""
+        if response.status_code == HTTPStatus.NOT_MODIFIED:
+            self.hits += 1
+            return True
+        _, previous = self.cache.get(tenant, (None, None))
+        digest = self.digest(response)
+        if digest is not None and digest == previous:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def remember(self, tenant: str, response, cpu: float = 0.0) -> None:
+        """Запоминает отпечаток успешно обработанного ответа."""
+        self.slow_path_cpu += cpu
+        headers = getattr(response, 'headers', None) or {}
+        self.cache.set(tenant, (headers.get('ETag'), self.digest(response)))
+
+    def stats(self) -> dict:
+        """Доля совпадений и оценка сэкономленного процессорного времени."""
+        total = self.hits + self.misses
+        average = self.slow_path_cpu / self.misses if self.misses else 0.0
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'cpu_saved': average * self.hits,
+        }
@@ -0,0 +1,223 @@
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+DECREASE_FACTOR = 0.5
+INCREASE_STEP = 0.05
+TENANT_WINDOW = 60 * 60
+
+
+def parse_retry_after(value: Optional[str],
+                      now: Optional[float] = None) -> Optional[float]:
+    """Переводит заголовок Retry-After (секунды или дата) в секунды."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        moment = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(moment - (time.time() if now is None else now), 0.0)
+
+
+class MemoryStore:
+    """Состояние общего ведра токенов внутри процесса."""
+
+    def __init__(self, state: dict):
+        self.lock = threading.Lock()
+        self.state = dict(state)
+
+    def update(self, change: Callable[[dict], float]) -> float:
+        """Атомарно меняет состояние функцией change."""
+        with self.lock:
+            return change(self.state)
+
+
+class SqliteStore:
+    """Состояние общего ведра токенов в SQLite, общее для процессов."""
+
+    def __init__(self, path: str, state: dict):
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            path, timeout=10, isolation_level=None, check_same_thread=False
+        )
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS governor (id INTEGER PRIMARY KEY, '
+            'tokens REAL, updated_at REAL, rate REAL, blocked_until REAL)'
+        )
+        self.connection.execute(
+            'INSERT OR IGNORE INTO governor VALUES (1, ?, ?, ?, ?)',
+            (state['tokens'], state['updated_at'], state['rate'],
+             state['blocked_until'])
+        )
+
+    def update(self, change: Callable[[dict], float]) -> float:
+        """Меняет состояние под блокировкой записи базы."""
+        with self.lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+            try:
+                tokens, updated_at, rate, blocked_until = (
+                    self.connection.execute(
+                        'SELECT tokens, updated_at, rate, blocked_until '
+                        'FROM governor WHERE id = 1'
+                    ).fetchone()
+                )
+                state = {'tokens': tokens, 'updated_at': updated_at,
+                         'rate': rate, 'blocked_until': blocked_until}
+                result = change(state)
+                self.connection.execute(
+                    'UPDATE governor SET tokens = ?, updated_at = ?, '
+                    'rate = ?, blocked_until = ? WHERE id = 1',
+                    (state['tokens'], state['updated_at'], state['rate'],
+                     state['blocked_until'])
+                )
+                self.connection.execute('COMMIT')
+            except Exception:
+                self.connection.execute('ROLLBACK')
+                raise
+        return result
+
+
+class RequestGovernor:
+    """Общий лимит запросов к API (ведро токенов).
+
+    Лимит снижается вдвое на 429 и 5xx, блокирует запросы на время из
+    Retry-After и постепенно восстанавливается после успешных ответов.
+    Доступный лимит поровну делится между активными пользователями:
+    теми, кто запрашивал API в последние TENANT_WINDOW секунд. Их число
+    не ограничено, иначе при большом числе пользователей доля каждого
+    оказалась бы завышенной.
+    """
+
+    def __init__(self, max_rate: float, burst: Optional[float] = None,
+                 min_rate: Optional[float] = None,
+                 store_path: Optional[str] = None,
+                 clock: Callable[[], float] = time.time,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.max_rate = max_rate
+        self.burst = burst or max(max_rate, 1.0)
+        self.min_rate = min_rate or max_rate / 100
+        self.clock = clock
+        self.sleep = sleep
+        state = {'tokens': self.burst, 'updated_at': clock(),
+                 'rate': max_rate, 'blocked_until': 0.0}
+        self.store = (
+            SqliteStore(store_path, state) if store_path
+            else MemoryStore(state)
+        )
+        self.lock = threading.Lock()
+        self.tenants = OrderedDict()
+        self.rate = max_rate
+        self.granted = 0
+        self.throttled = 0
+
+    def refill(self, state: dict, now: float) -> None:
+        """Пополняет общее ведро за прошедшее время."""
+        elapsed = max(now - state['updated_at'], 0.0)
+        state['tokens'] = min(
+            state['tokens'] + elapsed * state['rate'], self.burst
+        )
+        state['updated_at'] = now
+
+    def take_global(self, state: dict) -> float:
+        """Берет токен из общего ведра, возвращает время ожидания."""
+        now = self.clock()
+        self.refill(state, now)
+        self.rate = state['rate']
+        if now < state['blocked_until']:
+            return state['blocked_until'] - now
+        if state['tokens'] < 1:
+            return (1 - state['tokens']) / state['rate']
+        state['tokens'] -= 1
+        return 0.0
+
+    def reserve(self, tenant: str) -> float:
+        """Пытается получить разрешение на запрос.
+
+        Возвращает 0, если запрос разрешен, иначе сколько секунд ждать.
+        """
+        with self.lock:
+            now = self.clock()
+            self.expire_tenants(now)
+            tokens, updated_at = self.tenants.get(tenant, (1.0, now))
+            self.tenants[tenant] = (tokens, updated_at)
+            self.tenants.move_to_end(tenant)
+            share = self.rate / max(len(self.tenants), 1)
+            tokens = min(tokens + (now - updated_at) * share, 1.0)
+            if tokens < 1:
+                self.tenants[tenant] = (tokens, now)
+                return (1 - tokens) / share
+            wait = self.store.update(self.take_global)
+            self.tenants[tenant] = (tokens - 1 if not wait else tokens, now)
+            return wait
+
+    def expire_tenants(self, now: float) -> None:
+        """Забывает пользователей, не запрашивавших API дольше окна.
+
+        Пользователи упорядочены по последнему запросу, поэтому
+        устаревшие всегда в начале.
+        """
+        while self.tenants:
+            tenant, (_, updated_at) = next(iter(self.tenants.items()))
+            if now - updated_at < TENANT_WINDOW:
+                break
+            del self.tenants[tenant]
+
+    def acquire(self, tenant: str, timeout: float = 0) -> bool:
+        """Ждет разрешения на запрос не дольше timeout секунд."""
+        deadline = self.clock() + timeout
+        while True:
+            wait = self.reserve(tenant)
+            if not wait:
+                self.granted += 1
+                return True
+            if self.clock() + wait > deadline:
+                self.throttled += 1
+                return False
+            self.sleep(wait)
+
+    def penalize(self, retry_after: Optional[float] = None) -> None:
+        """Снижает лимит после 429/5xx и учитывает Retry-After."""
+        def change(state):
+            state['rate'] = max(state['rate'] * DECREASE_FACTOR,
+                                self.min_rate)
+            if retry_after:
+                state['blocked_until'] = max(
+                    state['blocked_until'], self.clock() + retry_after
+                )
+            self.rate = state['rate']
+            return state['rate']
+
+        rate = self.store.update(change)
+        logger.warning(f'Лимит запросов к API снижен до {rate:.3f} в секунду'
+                       + (f', пауза {retry_after:.0f} с.'
+                          if retry_after else ''))
+
+    def reward(self) -> None:
+        """Постепенно возвращает лимит после успешного ответа."""
+        def change(state):
+            state['rate'] = min(
+                state['rate'] + self.max_rate * INCREASE_STEP, self.max_rate
+            )
+            self.rate = state['rate']
+            return state['rate']
+
+        self.store.update(change)
+
+    def stats(self) -> dict:
+        """Текущий лимит и счетчики разрешенных и отложенных запросов."""
+        return {
+            'rate': self.rate,
+            'max_rate': self.max_rate,
+            'tenants': len(self.tenants),
+            'granted': self.granted,
+            'throttled': self.throttled,
+        }
@@ -0,0 +1,147 @@
+import json
+import logging
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class HealthMonitor:
+    """Отслеживает отставание цикла опроса от плана по каждому пользователю."""
+
+    def __init__(self, lag_threshold: float,
+                 queue: Optional[Callable[[], dict]] = None,
+                 breaker: Optional[Callable[[], str]] = None,
+                 scheduler: Optional[Callable[[], dict]] = None,
+                 fingerprints: Optional[Callable[[], dict]] = None,
+                 governor: Optional[Callable[[], dict]] = None,
+                 notifiers: Optional[Callable[[], dict]] = None,
+                 clock: Callable[[], float] = time.time):
+        self.lag_threshold = lag_threshold
+        self.queue = queue
+        self.breaker = breaker
+        self.scheduler = scheduler
+        self.fingerprints = fingerprints
+        self.governor = governor
+        self.notifiers = notifiers
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.planned = {}
+        self.started = {}
+        self.lags = {}
+        self.successes = {}
+
+    def poll_planned(self, tenant: str, at: float) -> None:
+        """Запоминает, когда должен начаться следующий опрос."""
+        with self.lock:
+            self.planned[tenant] = at
+
+    def poll_started(self, tenant: str) -> None:
+        """Фиксирует отставание начала опроса от запланированного."""
+        with self.lock:
+            now = self.clock()
+            planned = self.planned.pop(tenant, None)
+            if planned is not None:
+                self.lags[tenant] = max(now - planned, 0.0)
+            self.started[tenant] = now
+
+    def poll_finished(self, tenant: str) -> None:
+        """Отмечает, что опрос завершился, успешно или с ошибкой."""
+        with self.lock:
+            self.started.pop(tenant, None)
+
+    def poll_succeeded(self, tenant: str) -> None:
+        """Фиксирует время последнего успешного опроса."""
+        with self.lock:
+            self.successes[tenant] = self.clock()
+
+    def lag(self, tenant: str) -> float:
+        """Отставание от плана.
+
+        Растет, если опрос так и не начался или начался, но завис:
+        время незавершенного опроса добавляется к отставанию его начала.
+        """
+        planned = self.planned.get(tenant)
+        if planned is not None:
+            return max(self.clock() - planned, 0.0)
+        lag = self.lags.get(tenant, 0.0)
+        started = self.started.get(tenant)
+        if started is not None:
+            lag += max(self.clock() - started, 0.0)
+        return lag
+
+    def status(self) -> dict:
+        """Возвращает состояние бота для health-эндпоинта."""
+        now = self.clock()
+        with self.lock:
+            tenants = {
+                tenant: {
+                    'lag': self.lag(tenant),
+                    'since_success': (
+                        now - self.successes[tenant]
+                        if tenant in self.successes else None
+                    ),
+                }
+                for tenant in (
+                    set(self.planned) | set(self.started) | set(self.lags)
+                )
+            }
+        healthy = all(
+            tenant['lag'] <= self.lag_threshold
+            for tenant in tenants.values()
+        )
+        result = {'healthy': healthy, 'tenants': tenants}
+        if self.queue is not None:
+            result['outbox'] = self.queue()
+        if self.breaker is not None:
+            result['breaker'] = self.breaker()
+        if self.scheduler is not None:
+            result['scheduler'] = self.scheduler()
+        if self.fingerprints is not None:
+            result['fingerprints'] = self.fingerprints()
+        if self.governor is not None:
+            result['governor'] = self.governor()
+        if self.notifiers is not None:
+            result['notifiers'] = self.notifiers()
+        return result
+
+
+def make_handler(monitor: HealthMonitor):
+    """Создает обработчик запросов к /health."""
+
+    class HealthHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            """Отдает состояние бота, 503 если цикл опроса отстал."""
+            if self.path.rstrip('/') not in ('', '/health'):
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+            status = monitor.status()
+            body = json.dumps(status).encode()
+            self.send_response(
+                HTTPStatus.OK if status['healthy']
+                else HTTPStatus.SERVICE_UNAVAILABLE
+            )
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return HealthHandler
+
+
+def start_health_server(monitor: HealthMonitor, host: str,
+                        port: int) -> ThreadingHTTPServer:
+    """Запускает health-эндпоинт в фоновом потоке."""
+    server = ThreadingHTTPServer((host, port), make_handler(monitor))
+    threading.Thread(
+        target=server.serve_forever, name='health', daemon=True
+    ).start()
+    logger.info(f'Health-эндпоинт слушает {host}:{server.server_port}')
+    return server
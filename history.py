@@ -0,0 +1,175 @@
+import argparse
+import math
+import sqlite3
+import time
+from datetime import datetime
+from typing import Callable, Iterable, Optional
+
+STATUSES = ('reviewing', 'approved', 'rejected')
+STATUS_CODES = {status: code for code, status in enumerate(STATUSES, 1)}
+REVIEWED_CODES = (STATUS_CODES['approved'], STATUS_CODES['rejected'])
+PERIODS = {
+    'day': '%Y-%m-%d',
+    'week': '%Y-W%W',
+    'month': '%Y-%m',
+}
+PERCENTILES = (50, 90, 99)
+FETCH_BATCH = 10000
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS transitions (
+    id INTEGER PRIMARY KEY,
+    tenant TEXT NOT NULL,
+    homework TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    ts INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transitions_homework
+    ON transitions (tenant, homework, ts, status);
+CREATE INDEX IF NOT EXISTS transitions_ts ON transitions (ts);
+'''
+
+TURNAROUND_QUERY = '''
+SELECT homework, ts, ts - prev_ts FROM (
+    SELECT homework, status, ts,
+        LAG(status) OVER w AS prev_status,
+        LAG(ts) OVER w AS prev_ts
+    FROM transitions
+    WHERE (tenant, homework) IN (
+        SELECT tenant, homework FROM transitions
+        WHERE ts >= ? AND status IN (?, ?)
+    )
+    WINDOW w AS (PARTITION BY tenant, homework ORDER BY ts)
+)
+WHERE prev_status = ? AND status IN (?, ?) AND ts >= ?
+'''
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[int]:
+    """Переводит дату из ответа API в unix-время."""
+    if not value:
+        return None
+    try:
+        return int(datetime.strptime(
+            value.replace('Z', '+0000'), '%Y-%m-%dT%H:%M:%S%z'
+        ).timestamp())
+    except ValueError:
+        return None
+
+
+def percentile(values: list, rank: int) -> float:
+    """Возвращает перцентиль отсортированного списка (nearest-rank)."""
+    index = max(math.ceil(rank / 100 * len(values)) - 1, 0)
+    return values[index]
+
+
+class HistoryStore:
+    """Хранилище истории смены статусов домашних работ."""
+
+    def __init__(self, path: str, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+
+    def record(self, tenant: str, homework: dict, status: str) -> None:
+        """Сохраняет смену статуса работы."""
+        with self.connection:
+            self.insert(self.connection, tenant, homework, status)
+
+    def insert(self, connection: sqlite3.Connection, tenant: str,
+               homework: dict, status: str) -> None:
+        """Пишет смену статуса через connection, не завершая транзакцию.
+
+        Так переход записывается в одной транзакции с новым состоянием
+        в outbox, если таблица transitions лежит в той же базе.
+        """
+        ts = parse_timestamp(homework.get('date_updated'))
+        connection.execute(
+            'INSERT INTO transitions (tenant, homework, status, ts) '
+            'VALUES (?, ?, ?, ?)',
+            (tenant, homework.get('homework_name'), STATUS_CODES[status],
+             ts if ts is not None else int(self.clock()))
+        )
+
+    def record_many(self, rows: Iterable[tuple]) -> None:
+        """Пакетно сохраняет строки (tenant, homework, status, ts)."""
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO transitions (tenant, homework, status, ts) '
+                'VALUES (?, ?, ?, ?)',
+                ((tenant, homework, STATUS_CODES[status], int(ts))
+                 for tenant, homework, status, ts in rows)
+            )
+
+    def turnarounds(self, since: int = 0) -> Iterable[tuple]:
+        """Порциями отдает (работа, время вердикта, длительность ревью)."""
+        cursor = self.connection.execute(
+            TURNAROUND_QUERY,
+            (since,) + REVIEWED_CODES
+            + (STATUS_CODES['reviewing'],) + REVIEWED_CODES + (since,)
+        )
+        while True:
+            rows = cursor.fetchmany(FETCH_BATCH)
+            if not rows:
+                break
+            yield from rows
+
+    def report(self, period: str = 'week', by_homework: bool = False,
+               since: int = 0) -> dict:
+        """Считает перцентили длительности ревью по периодам или работам."""
+        groups = {}
+        for homework, ts, duration in self.turnarounds(since):
+            if by_homework:
+                key = homework
+            else:
+                key = time.strftime(PERIODS[period], time.gmtime(ts))
+            groups.setdefault(key, []).append(duration)
+        result = {}
+        for key, durations in sorted(groups.items()):
+            durations.sort()
+            result[key] = {
+                'count': len(durations),
+                **{f'p{rank}': percentile(durations, rank)
+                   for rank in PERCENTILES},
+            }
+        return result
+
+    def close(self) -> None:
+        """Закрывает соединение с базой."""
+        self.connection.close()
+
+
+def format_duration(seconds: float) -> str:
+    """Форматирует длительность в часах."""
+    return f'{seconds / 3600:.1f} ч'
+
+
+def main(argv: Optional[list] = None) -> None:
+    """Выводит отчет о длительности ревью."""
+    parser = argparse.ArgumentParser(
+        description='Перцентили длительности ревью домашних работ.'
+    )
+    parser.add_argument('--db', default='homework.sqlite3')
+    parser.add_argument('--period', choices=PERIODS, default='week')
+    parser.add_argument('--by-homework', action='store_true')
+    parser.add_argument('--days', type=int, default=0,
+                        help='учитывать только последние N дней')
+    args = parser.parse_args(argv)
+    since = int(time.time()) - args.days * 86400 if args.days else 0
+    store = HistoryStore(args.db)
+    report = store.report(args.period, args.by_homework, since)
+    store.close()
+    if not report:
+        print('Нет данных о завершенных ревью.')
+        return
+    for key, row in report.items():
+        percentiles = ' '.join(
+            f'p{rank}={format_duration(row[f"p{rank}"])}'
+            for rank in PERCENTILES
+        )
+        print(f'{key}\tn={row["count"]}\t{percentiles}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,30 @@
 import os
+import struct
 import sys
 import time
 import logging
+from dataclasses import dataclass
 from http import HTTPStatus
+from typing import Callable, List, Optional
 
 import telegram
 import requests
 from dotenv import load_dotenv
 
-from exceptions import BadReturnAnswer
+from breaker import CircuitBreaker
+from exceptions import (ApiUnavailable, BadReturnAnswer, ServerError,
+                        TooManyRequests)
+from fingerprints import PayloadFingerprints
+from governor import RequestGovernor, parse_retry_after
+from health import HealthMonitor, start_health_server
+from history import HistoryStore
+from memory import BoundedCache, MemoryTracer
+from notifiers import (FanOut, Notifier, SmtpNotifier, TelegramNotifier,
+                       WebhookNotifier)
+from outbox import Outbox, OutboxDispatcher, make_key
+from scheduler import PollScheduler
+from state_table import StateTable, tenant_id
+from templates import DEFAULT_LOCALE, Templates
 
 try:
     from json.decoder import JSONDecodeError
@@ -24,47 +40,104 @@ TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-# Добавляем файловый лог
-fileHandler = logging.FileHandler('homework.log')
-fileHandler.setFormatter(formatter)
-logger.addHandler(fileHandler)
-# Добавляем вывод лога в консоль
-streamHandler = logging.StreamHandler(sys.stdout)
-streamHandler.setFormatter(formatter)
-logger.addHandler(streamHandler)
 
 RETRY_TIME = 600
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
 LAST_ELEMENT = -1
-
-
-HOMEWORK_STATUSES = {
-    'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
-    'reviewing': 'Работа взята на проверку ревьюером.',
-    'rejected': 'Работа проверена: у ревьюера есть замечания.'
-}
-
-
-def send_message(bot: telegram.bot, message: str):
-    """Отправляет сообщение в чат телеграмма."""
+OUTBOX_PATH = os.getenv('OUTBOX_PATH', 'homework.sqlite3')
+CACHE_MAX_SIZE = int(os.getenv('CACHE_MAX_SIZE', 1024))
+CACHE_TTL = int(os.getenv('CACHE_TTL', 60 * 60 * 24))
+MEMORY_TRACE = bool(os.getenv('MEMORY_TRACE'))
+MEMORY_SNAPSHOT_INTERVAL = int(os.getenv('MEMORY_SNAPSHOT_INTERVAL', 0))
+REQUEST_TIMEOUT = int(os.getenv('REQUEST_TIMEOUT', 30))
+BREAKER_THRESHOLD = int(os.getenv('BREAKER_THRESHOLD', 5))
+BREAKER_RESET = int(os.getenv('BREAKER_RESET', RETRY_TIME * 3))
+HEALTH_HOST = os.getenv('HEALTH_HOST', '0.0.0.0')
+HEALTH_PORT = int(os.getenv('HEALTH_PORT', 0))
+HEALTH_LAG_THRESHOLD = int(os.getenv('HEALTH_LAG_THRESHOLD', RETRY_TIME))
+API_MAX_RATE = float(os.getenv('API_MAX_RATE', 1))
+API_BURST = float(os.getenv('API_BURST', 5))
+API_MAX_WAIT = float(os.getenv('API_MAX_WAIT', 5))
+GOVERNOR_DB = os.getenv('GOVERNOR_DB')
+OVERLOAD_LAG = int(os.getenv('OVERLOAD_LAG', RETRY_TIME // 2))
+OVERLOAD_MODE = os.getenv('OVERLOAD_MODE', 'auto')
+OVERLOAD_MAX_SKIPS = int(os.getenv('OVERLOAD_MAX_SKIPS', 3))
+STATE_SNAPSHOT_PATH = os.getenv('STATE_SNAPSHOT_PATH', 'homework.state')
+STATE_SNAPSHOT_INTERVAL = int(os.getenv('STATE_SNAPSHOT_INTERVAL', RETRY_TIME))
+NOTIFY_TIMEOUT = int(os.getenv('NOTIFY_TIMEOUT', 10))
+NOTIFY_RETRIES = int(os.getenv('NOTIFY_RETRIES', 2))
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+SMTP_HOST = os.getenv('SMTP_HOST')
+SMTP_PORT = int(os.getenv('SMTP_PORT', 25))
+SMTP_FROM = os.getenv('SMTP_FROM', 'homework-bot@localhost')
+SMTP_TO = os.getenv('SMTP_TO')
+BOT_LOCALE = os.getenv('BOT_LOCALE', 'ru')
+# Язык уведомлений по чатам в виде "chat_id:en,chat_id:ru",
+# проверяется при запуске в main()
+TENANT_LOCALES = dict(
+    pair.split(':', 1)
+    for pair in os.getenv('TENANT_LOCALES', '').split(',') if ':' in pair
+)
+
+TEMPLATES = Templates(
+    default_locale=BOT_LOCALE,
+    cache=BoundedCache(CACHE_MAX_SIZE, CACHE_TTL)
+)
+
+# Тексты вердиктов берутся из locales/ru.json, ключи задают
+# документированные статусы работы
+HOMEWORK_STATUSES = TEMPLATES.verdicts[DEFAULT_LOCALE]
+
+
+def setup_logging() -> None:
+    """Выводит лог бота в файл и в консоль.
+
+    Обработчики вешаются на корневой логгер, чтобы в них попадали
+    сообщения всех модулей бота. Вызывается из main(), поэтому импорт
+    модуля, например в тестах, лог не пишет.
+    """
+    rootLogger = logging.getLogger()
+    rootLogger.setLevel(logging.INFO)
+    formatter = logging.Formatter(
+        '%(asctime)s - %(levelname)s - %(message)s'
+    )
+    # Добавляем файловый лог
+    fileHandler = logging.FileHandler('homework.log')
+    fileHandler.setFormatter(formatter)
+    rootLogger.addHandler(fileHandler)
+    # Добавляем вывод лога в консоль
+    streamHandler = logging.StreamHandler(sys.stdout)
+    streamHandler.setFormatter(formatter)
+    rootLogger.addHandler(streamHandler)
+
+
+def send_message(bot: telegram.bot, message: str) -> bool:
+    """Отправляет сообщение в чат телеграмма, возвращает успех отправки."""
     try:
         bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=message)
         logger.info(f'Бот отправил сообщение {message}')
+        return True
     except telegram.error.TelegramError as error:
         logger.error(f'Не удалось отправить сообщение в телеграмм: {error}')
+        return False
 
 
-def get_api_answer(current_timestamp: int) -> dict:
-    """Получает ответ от сервера и возвращает результат."""
+def request_api(current_timestamp: int,
+                headers: Optional[dict] = None) -> requests.Response:
+    """Запрашивает статусы у сервера и возвращает ответ без разбора.
+
+    При условном запросе (headers с If-None-Match) ответ 304 тоже
+    считается корректным.
+    """
     timestamp = current_timestamp or int(time.time())
     params = {'from_date': timestamp}
     try:
         homework_statuses = requests.get(
             ENDPOINT,
-            headers=HEADERS,
-            params=params
+            headers={**HEADERS, **(headers or {})},
+            params=params,
+            timeout=REQUEST_TIMEOUT
         )
     except requests.exceptions.HTTPError as error:
         logger.error(f'Сбой в работе программы: '
@@ -77,17 +150,46 @@ def get_api_answer(current_timestamp: int) -> dict:
                         f'Ошибка: {error}')
     except requests.exceptions.Timeout as error:
         logger.error(f'Сбой в работе программы! Ошибка url: {error}')
-        raise Exception(f'Сбой в работе программы! Ошибка url: {error}')
+        raise ApiUnavailable(
+            f'Сбой в работе программы! Ошибка url: {error}'
+        )
     except requests.exceptions.ConnectionError as error:
         logger.error(f'Ошибка соединения: {error}')
-        raise Exception(f'Ошибка соединения: {error}')
+        raise ApiUnavailable(f'Ошибка соединения: {error}')
     except requests.exceptions.RequestException as error:
         logger.error(f'Что то пошло не так: {error}')
         raise Exception(f'Что то пошло не так: {error}')
 
-    if homework_statuses.status_code != HTTPStatus.OK:
-        logger.error('Некоректный ответ от сервера.')
-        raise BadReturnAnswer('Некоректный ответ от сервера.')
+    expected = (HTTPStatus.OK, HTTPStatus.NOT_MODIFIED) if headers else (
+        HTTPStatus.OK,
+    )
+    check_status(homework_statuses, expected)
+    return homework_statuses
+
+
+def check_status(homework_statuses: requests.Response,
+                 expected: tuple) -> None:
+    """Проверяет код ответа сервера."""
+    status_code = homework_statuses.status_code
+    if status_code in expected:
+        return
+    headers = getattr(homework_statuses, 'headers', None) or {}
+    retry_after = parse_retry_after(headers.get('Retry-After'))
+    if status_code == HTTPStatus.TOO_MANY_REQUESTS:
+        logger.error(f'Превышен лимит запросов к API, '
+                     f'Retry-After: {retry_after}')
+        raise TooManyRequests('Превышен лимит запросов к API.', retry_after)
+    if status_code >= HTTPStatus.INTERNAL_SERVER_ERROR:
+        logger.error(f'Ошибка сервера. Код ответа: {status_code}, '
+                     f'Retry-After: {retry_after}')
+        raise ServerError(f'Ошибка сервера. Код ответа: {status_code}',
+                          retry_after)
+    logger.error('Некоректный ответ от сервера.')
+    raise BadReturnAnswer('Некоректный ответ от сервера.')
+
+
+def decode_answer(homework_statuses: requests.Response) -> dict:
+    """Разбирает JSON из ответа сервера."""
     try:
         ret_answer = homework_statuses.json()
         return ret_answer
@@ -95,6 +197,11 @@ def get_api_answer(current_timestamp: int) -> dict:
         logger.error('Не удалось получить ответ от сервера!')
 
 
+def get_api_answer(current_timestamp: int) -> dict:
+    """Получает ответ от сервера и возвращает результат."""
+    return decode_answer(request_api(current_timestamp))
+
+
 def check_response(response: dict) -> dict:
     """Проверяет ответ API на корректность."""
     if not isinstance(response, dict):
@@ -132,6 +239,11 @@ def return_check_status(homework):
 
 def parse_status(homework: dict) -> str:
     """Извлекает из информации о домашней работе, статус этой работы."""
+    return render_status(homework, BOT_LOCALE)
+
+
+def render_status(homework: dict, locale: str) -> str:
+    """Проверяет работу и возвращает сообщение о ее статусе на языке locale."""
     if not isinstance(homework, dict):
         logger.error('Пришел неверный тип данных от сервера!')
         raise TypeError('Пришел неверный тип данных от сервера!')
@@ -144,9 +256,80 @@ def parse_status(homework: dict) -> str:
     else:
         homework_name = homework.get('homework_name')
 
-    verdict = HOMEWORK_STATUSES.get(homework_status)
-    return (f'Изменился статус проверки работы '
-            f'"{homework_name}". {verdict}')
+    return TEMPLATES.render_status(str(homework_name), homework_status, locale)
+
+
+def build_notifiers(bot: telegram.Bot) -> List[Notifier]:
+    """Собирает каналы доставки, настроенные в переменных окружения."""
+    options = {'timeout': NOTIFY_TIMEOUT, 'retries': NOTIFY_RETRIES}
+    notifiers = [TelegramNotifier(bot, TELEGRAM_CHAT_ID, **options)]
+    if WEBHOOK_URL:
+        notifiers.append(WebhookNotifier(WEBHOOK_URL, **options))
+    if SMTP_HOST and SMTP_TO:
+        notifiers.append(SmtpNotifier(
+            SMTP_HOST, SMTP_PORT, SMTP_FROM, SMTP_TO, **options
+        ))
+    return notifiers
+
+
+def load_state_table(path: str) -> StateTable:
+    """Отображает в память снимок состояния или создает пустую таблицу."""
+    try:
+        return StateTable.load(path, HOMEWORK_STATUSES)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, struct.error) as error:
+        logger.warning(f'Снимок состояния {path} не загружен: {error}')
+    return StateTable(HOMEWORK_STATUSES)
+
+
+def restore_schedule(table: StateTable, scheduler: PollScheduler,
+                     tenants: List[str], current_timestamp: int) -> None:
+    """Ставит пользователей в расписание с сохраненными статусами.
+
+    Новым пользователям курсор from_date ставится в current_timestamp,
+    у пользователей из снимка продолжается сохраненный курсор.
+    """
+    for tenant in tenants:
+        table.add(tenant_id(tenant), cursor=current_timestamp)
+        status, _, next_poll = table.get(tenant_id(tenant))
+        scheduler.add(tenant, due=next_poll or None)
+        scheduler.update(tenant, status, False)
+
+
+def track_schedule(table: StateTable,
+                   monitor: HealthMonitor) -> Callable[[str, float], None]:
+    """Возвращает обработчик назначения опроса для PollScheduler.
+
+    Время следующего опроса попадает в таблицу состояний и в мониторинг,
+    в том числе для опросов, отложенных или пропущенных при перегрузке:
+    иначе намеренный сброс нагрузки выглядел бы как зависание.
+    """
+    def planned(tenant: str, due: float) -> None:
+        table.set_next_poll(tenant_id(tenant), due)
+        monitor.poll_planned(tenant, due)
+
+    return planned
+
+
+def locale_for(tenant: str) -> str:
+    """Язык уведомлений пользователя."""
+    return TENANT_LOCALES.get(tenant, BOT_LOCALE)
+
+
+def report_poll(bot: telegram.Bot, tenant: str, failing: set,
+                error: Optional[Exception] = None) -> None:
+    """Сообщает о сбое опроса или о восстановлении после сбоя.
+
+    Без error вызывается только после опроса, который дошел до API
+    и завершился успешно.
+    """
+    if error is not None:
+        failing.add(tenant)
+        send_message(bot, TEMPLATES.render_error(error, locale_for(tenant)))
+    elif tenant in failing:
+        failing.discard(tenant)
+        send_message(bot, TEMPLATES.render_recovery(locale_for(tenant)))
 
 
 def check_tokens() -> bool:
@@ -169,32 +352,229 @@ def check_tokens() -> bool:
     return True
 
 
+def check_homework(outbox: Outbox, history: HistoryStore, tenant: str,
+                   current_timestamp: int,
+                   fingerprints: Optional[PayloadFingerprints] = None,
+                   table: Optional[StateTable] = None) -> bool:
+    """Опрашивает API и ставит в outbox сообщение при смене статуса.
+
+    Если ответ совпадает с последним обработанным, разбор и проверка
+    пропускаются. Время разбора считается по процессорному времени
+    текущего потока, чтобы в него не попадала работа потоков доставки.
+    Возвращает True, если статус изменился.
+    """
+    if fingerprints is None:
+        return process_answer(
+            outbox, history, tenant, get_api_answer(current_timestamp), table
+        )
+    homework_statuses = request_api(
+        current_timestamp, fingerprints.headers(tenant)
+    )
+    if fingerprints.unchanged(tenant, homework_statuses):
+        return False
+    started = time.thread_time()
+    changed = process_answer(
+        outbox, history, tenant, decode_answer(homework_statuses), table
+    )
+    fingerprints.remember(
+        tenant, homework_statuses, time.thread_time() - started
+    )
+    return changed
+
+
+def process_answer(outbox: Outbox, history: HistoryStore, tenant: str,
+                   response: dict, table: Optional[StateTable] = None
+                   ) -> bool:
+    """Проверяет ответ API и ставит в outbox сообщение при смене статуса.
+
+    Если передана таблица состояний, курсор from_date пользователя
+    сдвигается на current_date из ответа, чтобы следующий запрос
+    возвращал только работы, изменившиеся после этого опроса.
+    """
+    homeworks = check_response(response)
+    changed = bool(homeworks) and record_change(
+        outbox, history, tenant, homeworks[LAST_ELEMENT]
+    )
+    if table is not None:
+        table.set_cursor(tenant_id(tenant), int(response['current_date']))
+    return changed
+
+
+def record_change(outbox: Outbox, history: HistoryStore, tenant: str,
+                  homework: dict) -> bool:
+    """Ставит в outbox сообщение, если статус работы изменился.
+
+    Переход пишется в историю в той же транзакции, поэтому история
+    должна храниться в базе outbox.
+    """
+    homework_status = return_check_status(homework)
+    if outbox.get_state(tenant) == homework_status:
+        return False
+    message_status = render_status(homework, locale_for(tenant))
+    return outbox.record(
+        tenant, homework_status, message_status,
+        make_key(tenant, homework, homework_status),
+        lambda connection: history.insert(
+            connection, tenant, homework, homework_status
+        )
+    )
+
+
+def poll(outbox: Outbox, history: HistoryStore, breaker: CircuitBreaker,
+         monitor: HealthMonitor, tenant: str, current_timestamp: int,
+         fingerprints: Optional[PayloadFingerprints] = None,
+         governor: Optional[RequestGovernor] = None,
+         table: Optional[StateTable] = None) -> Optional[bool]:
+    """Опрашивает API с учетом защиты от сбоев и лимита запросов.
+
+    Обновляет состояние защиты, лимита и мониторинга по результату.
+    Защиту размыкают только сбои доступа к API: таймаут, обрыв
+    соединения, 5xx и 429. Ошибки разбора ответа одного пользователя
+    пробрасываются, не мешая опросу остальных.
+    Возвращает None, если опрос пропущен и API не запрашивалось.
+    """
+    if not breaker.allow():
+        logger.info('Опрос пропущен: API недоступно')
+        return None
+    if governor is not None and not governor.acquire(tenant, API_MAX_WAIT):
+        logger.info('Опрос отложен: исчерпан лимит запросов к API')
+        return None
+    try:
+        changed = check_homework(
+            outbox, history, tenant, current_timestamp, fingerprints, table
+        )
+    except (TooManyRequests, ServerError) as error:
+        breaker.failure()
+        if governor is not None:
+            governor.penalize(error.retry_after)
+        raise
+    except ApiUnavailable:
+        breaker.failure()
+        raise
+    breaker.success()
+    if governor is not None:
+        governor.reward()
+    monitor.poll_succeeded(tenant)
+    return changed
+
+
+@dataclass
+class Pipeline:
+    """Компоненты конвейера опроса, общие для всех пользователей."""
+
+    outbox: Outbox
+    history: HistoryStore
+    dispatcher: OutboxDispatcher
+    scheduler: PollScheduler
+    table: StateTable
+    monitor: HealthMonitor
+    breaker: CircuitBreaker
+    fingerprints: Optional[PayloadFingerprints] = None
+    governor: Optional[RequestGovernor] = None
+
+
+def finish_poll(pipeline: Pipeline, tenant: str, changed: bool) -> None:
+    """Учитывает результат опроса, дошедшего до API."""
+    if changed:
+        pipeline.dispatcher.wake()
+    status = pipeline.outbox.get_state(tenant)
+    pipeline.scheduler.update(tenant, status, changed)
+    pipeline.table.set_status(tenant_id(tenant), status)
+
+
+def run_due_polls(pipeline: Pipeline,
+                  report: Callable[[str, Optional[Exception]], None]) -> int:
+    """Выполняет наступившие по расписанию опросы.
+
+    report(tenant, error) вызывается после каждого опроса, дошедшего
+    до API: с ошибкой или с None при успехе. Возвращает число опросов,
+    пропущенных защитой от сбоев или лимитом запросов.
+    """
+    skipped = 0
+    for tenant in pipeline.scheduler.due():
+        pipeline.monitor.poll_started(tenant)
+        try:
+            _, cursor, _ = pipeline.table.get(tenant_id(tenant))
+            changed = poll(
+                pipeline.outbox, pipeline.history, pipeline.breaker,
+                pipeline.monitor, tenant, cursor, pipeline.fingerprints,
+                pipeline.governor, pipeline.table
+            )
+            if changed is None:
+                skipped += 1
+            else:
+                finish_poll(pipeline, tenant, changed)
+                report(tenant, None)
+        except Exception as error:
+            report(tenant, error)
+        pipeline.monitor.poll_finished(tenant)
+        pipeline.scheduler.complete(tenant)
+    return skipped
+
+
 def main():
     """Основная логика работы бота."""
+    setup_logging()
     bot = telegram.Bot(token=TELEGRAM_TOKEN)
+    TENANT_LOCALES.update(TEMPLATES.resolve_locales(TENANT_LOCALES))
     current_timestamp = int(time.time()) - 60 * 60 * 24
-    response_status_glob = ''
+    tenants = [str(TELEGRAM_CHAT_ID)]
+    fanout = FanOut(build_notifiers(bot))
+    outbox = Outbox(
+        OUTBOX_PATH,
+        states=BoundedCache(CACHE_MAX_SIZE, CACHE_TTL),
+        channels=fanout.channels
+    )
+    history = HistoryStore(OUTBOX_PATH)
+    dispatcher = OutboxDispatcher(outbox, fanout.deliver)
+    dispatcher.start()
+    tracer = MemoryTracer(MEMORY_SNAPSHOT_INTERVAL)
+    tracer.install_signal()
+    if MEMORY_TRACE:
+        tracer.start()
+    breaker = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_RESET)
+    fingerprints = PayloadFingerprints(
+        BoundedCache(CACHE_MAX_SIZE, CACHE_TTL)
+    )
+    governor = RequestGovernor(
+        API_MAX_RATE, API_BURST, store_path=GOVERNOR_DB
+    )
+    scheduler = PollScheduler(
+        RETRY_TIME, OVERLOAD_LAG, overload_mode=OVERLOAD_MODE,
+        max_skips=OVERLOAD_MAX_SKIPS
+    )
+    monitor = HealthMonitor(
+        HEALTH_LAG_THRESHOLD,
+        queue=outbox.stats,
+        breaker=lambda: breaker.state,
+        scheduler=scheduler.metrics,
+        fingerprints=fingerprints.stats,
+        governor=governor.stats,
+        notifiers=fanout.metrics
+    )
+    if HEALTH_PORT:
+        start_health_server(monitor, HEALTH_HOST, HEALTH_PORT)
+    table = load_state_table(STATE_SNAPSHOT_PATH)
+    scheduler.on_schedule = track_schedule(table, monitor)
+    restore_schedule(table, scheduler, tenants, current_timestamp)
+    pipeline = Pipeline(
+        outbox, history, dispatcher, scheduler, table, monitor, breaker,
+        fingerprints, governor
+    )
+    snapshot_at = time.time() + STATE_SNAPSHOT_INTERVAL
+    failing = set()
 
     while True:
-        try:
-            if not check_tokens():
-                time.sleep(RETRY_TIME)
-                continue
-            response = get_api_answer(current_timestamp)
-            response = check_response(response)
-            if not response:
-                time.sleep(RETRY_TIME)
-                continue
-            homework_status = return_check_status(response[LAST_ELEMENT])
-            if response_status_glob != homework_status:
-                response_status_glob = homework_status
-                message_status = parse_status(response[LAST_ELEMENT])
-                send_message(bot, message_status)
-            time.sleep(RETRY_TIME)
-        except Exception as error:
-            message = f'Сбой в работе программы: {error}'
-            send_message(bot, message)
-            time.sleep(RETRY_TIME)
+        if check_tokens():
+            run_due_polls(
+                pipeline,
+                lambda tenant, error: report_poll(bot, tenant, failing, error)
+            )
+        if time.time() >= snapshot_at:
+            table.snapshot(STATE_SNAPSHOT_PATH)
+            snapshot_at = time.time() + STATE_SNAPSHOT_INTERVAL
+        tracer.maybe_snapshot()
+        time.sleep(scheduler.sleep_time())
 
 
 if __name__ == '__main__':
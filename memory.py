@@ -0,0 +1,136 @@
+import logging
+import os
+import signal
+import time
+import tracemalloc
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_MAX_SIZE = 1024
+CACHE_TTL = 24 * 60 * 60
+SNAPSHOT_TOP = 10
+MISSING = object()
+
+
+def current_rss() -> int:
+    """Возвращает текущий размер резидентной памяти процесса в байтах."""
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        # На macOS ru_maxrss в байтах, на Linux в килобайтах,
+        # в любом случае это пик, а не текущее значение
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class BoundedCache:
+    """Кэш с ограничением по размеру (LRU) и времени жизни записей (TTL)."""
+
+    def __init__(self, max_size: int = CACHE_MAX_SIZE,
+                 ttl: Optional[float] = CACHE_TTL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.data = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key: Hashable, default=None):
+        """Возвращает значение и помечает его как недавно использованное."""
+        item = self.data.get(key, MISSING)
+        if item is MISSING:
+            return default
+        value, expires_at = item
+        if expires_at is not None and expires_at <= self.clock():
+            del self.data[key]
+            self.evictions += 1
+            return default
+        self.data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value) -> None:
+        """Сохраняет значение, вытесняя самые старые записи."""
+        expires_at = self.clock() + self.ttl if self.ttl else None
+        self.data[key] = (value, expires_at)
+        self.data.move_to_end(key)
+        while len(self.data) > self.max_size:
+            self.data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default=None):
+        """Удаляет значение из кэша."""
+        item = self.data.pop(key, MISSING)
+        return default if item is MISSING else item[0]
+
+    def clear(self) -> None:
+        """Очищает кэш."""
+        self.data.clear()
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, key):
+        return self.get(key, MISSING) is not MISSING
+
+
+class MemoryTracer:
+    """Снимки tracemalloc по расписанию и по сигналу с выводом разницы."""
+
+    def __init__(self, interval: float = 0, top: int = SNAPSHOT_TOP,
+                 clock: Callable[[], float] = time.monotonic):
+        self.interval = interval
+        self.top = top
+        self.clock = clock
+        self.previous = None
+        self.last_snapshot_at = clock()
+
+    def start(self) -> None:
+        """Включает трассировку и делает первый снимок."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.previous = self.take()
+        self.last_snapshot_at = self.clock()
+        logger.info('Трассировка памяти включена')
+
+    def take(self) -> tracemalloc.Snapshot:
+        """Делает снимок без учета аллокаций самого tracemalloc."""
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+
+    def snapshot(self) -> list:
+        """Сравнивает новый снимок с предыдущим и пишет разницу в лог."""
+        if self.previous is None:
+            self.start()
+            return []
+        current = self.take()
+        stats = current.compare_to(self.previous, 'lineno')[:self.top]
+        self.previous = current
+        self.last_snapshot_at = self.clock()
+        traced, peak = tracemalloc.get_traced_memory()
+        logger.info(f'Память: RSS {current_rss() // 1024} КБ, '
+                    f'tracemalloc {traced // 1024} КБ, '
+                    f'пик {peak // 1024} КБ')
+        for stat in stats:
+            logger.info(f'Память: {stat}')
+        return stats
+
+    def maybe_snapshot(self) -> None:
+        """Делает снимок, если с прошлого прошло больше interval секунд."""
+        if not self.interval or self.previous is None:
+            return
+        if self.clock() - self.last_snapshot_at >= self.interval:
+            self.snapshot()
+
+    def install_signal(self, signum: int = getattr(signal, 'SIGUSR1', 0)):
+        """Делает снимок при получении сигнала (по умолчанию SIGUSR1).
+
+        Первый сигнал включает трассировку, следующие выводят разницу.
+        """
+        if signum:
+            signal.signal(signum, lambda *args: self.snapshot())
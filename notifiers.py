@@ -0,0 +1,253 @@
+import logging
+import smtplib
+from abc import ABC, abstractmethod
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from email.message import EmailMessage
+from typing import Dict, List, Tuple
+
+import requests
+import telegram
+
+logger = logging.getLogger(__name__)
+
+EMAIL_SUBJECT = 'Статус домашней работы'
+CHANNEL_WORKERS = 4
+
+
+class NotifierMetrics:
+    """Счетчики доставки и задержки одного канала."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.attempts = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.latency_last = 0.0
+
+    def observe(self, ok: bool, attempts: int, latency: float) -> None:
+        """Учитывает результат одной доставки."""
+        with self.lock:
+            if ok:
+                self.sent += 1
+            else:
+                self.failed += 1
+            self.attempts += attempts
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+            self.latency_last = latency
+
+    def as_dict(self) -> dict:
+        """Возвращает счетчики словарем."""
+        with self.lock:
+            total = self.sent + self.failed
+            return {
+                'sent': self.sent,
+                'failed': self.failed,
+                'attempts': self.attempts,
+                'latency_avg': self.latency_total / total if total else 0.0,
+                'latency_max': self.latency_max,
+                'latency_last': self.latency_last,
+            }
+
+
+class Notifier(ABC):
+    """Канал доставки уведомлений со своим таймаутом и повторами."""
+
+    name = 'notifier'
+
+    def __init__(self, timeout: float = 10, retries: int = 2,
+                 backoff: float = 1.0):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.metrics = NotifierMetrics()
+
+    @property
+    def deadline(self) -> float:
+        """Максимальное время доставки с учетом всех повторов."""
+        pauses = sum(self.backoff * 2 ** attempt
+                     for attempt in range(self.retries))
+        return self.timeout * (self.retries + 1) + pauses
+
+    @abstractmethod
+    def deliver(self, message: str, key: str) -> None:
+        """Доставляет сообщение, при ошибке бросает исключение."""
+
+    def send(self, message: str, key: str) -> bool:
+        """Доставляет сообщение с повторами, возвращает успех."""
+        started = time.monotonic()
+        for attempt in range(self.retries + 1):
+            try:
+                self.deliver(message, key)
+            except Exception as error:
+                logger.warning(f'Канал {self.name}: не удалось доставить '
+                               f'сообщение, попытка {attempt + 1}: {error}')
+                if attempt < self.retries:
+                    time.sleep(self.backoff * 2 ** attempt)
+                continue
+            self.metrics.observe(True, attempt + 1,
+                                 time.monotonic() - started)
+            logger.info(f'Канал {self.name}: отправлено сообщение {message}')
+            return True
+        self.metrics.observe(False, self.retries + 1,
+                             time.monotonic() - started)
+        return False
+
+
+class TelegramNotifier(Notifier):
+    """Отправка в чат телеграмма."""
+
+    name = 'telegram'
+
+    def __init__(self, bot: telegram.Bot, chat_id, **kwargs):
+        super().__init__(**kwargs)
+        self.bot = bot
+        self.chat_id = chat_id
+
+    def deliver(self, message: str, key: str) -> None:
+        """Отправляет сообщение ботом."""
+        self.bot.send_message(
+            chat_id=self.chat_id, text=message, timeout=self.timeout
+        )
+
+
+class WebhookNotifier(Notifier):
+    """POST-запрос с сообщением на произвольный адрес."""
+
+    name = 'webhook'
+
+    def __init__(self, url: str, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+
+    def deliver(self, message: str, key: str) -> None:
+        """Отправляет сообщение JSON-ом с ключом идемпотентности."""
+        response = requests.post(
+            self.url,
+            json={'text': message, 'idempotency_key': key},
+            headers={'Idempotency-Key': key},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+
+
+class SmtpNotifier(Notifier):
+    """Письмо через SMTP-релей."""
+
+    name = 'smtp'
+
+    def __init__(self, host: str, port: int, sender: str, recipient: str,
+                 **kwargs):
+        super().__init__(**kwargs)
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipient = recipient
+
+    def deliver(self, message: str, key: str) -> None:
+        """Отправляет письмо, Message-ID строится из ключа."""
+        email = EmailMessage()
+        email['Subject'] = EMAIL_SUBJECT
+        email['From'] = self.sender
+        email['To'] = self.recipient
+        email['Message-ID'] = f'<{key}@homework-bot>'
+        email.set_content(message)
+        with smtplib.SMTP(self.host, self.port,
+                          timeout=self.timeout) as smtp:
+            smtp.send_message(email)
+
+
+class FanOut:
+    """Параллельная доставка сообщений во все каналы.
+
+    У каждого канала свой пул потоков, поэтому очередь к медленному
+    каналу не занимает потоки остальных.
+
+    Поток канала, не уложившегося в срок, продолжает работать и может
+    доставить сообщение позже. Такая отправка запоминается по ключу:
+    повтор из outbox сначала забирает ее результат и не отправляет
+    сообщение второй раз, пока первая попытка не завершилась.
+    """
+
+    def __init__(self, notifiers: List[Notifier]):
+        self.notifiers: Dict[str, Notifier] = {
+            notifier.name: notifier for notifier in notifiers
+        }
+        self.executors: Dict[str, ThreadPoolExecutor] = {
+            name: ThreadPoolExecutor(
+                max_workers=CHANNEL_WORKERS,
+                thread_name_prefix=f'notifier-{name}'
+            )
+            for name in self.notifiers
+        }
+        self.late: Dict[str, Future] = {}
+
+    @property
+    def channels(self) -> Tuple[str, ...]:
+        """Имена подключенных каналов."""
+        return tuple(self.notifiers)
+
+    def submit(self, notifier: Notifier, message: str,
+               key: str) -> Tuple[Future, float]:
+        """Запускает доставку или возвращает незавершенную прошлую.
+
+        Для прошлой доставки результат не ждется: она уже исчерпала
+        свой срок.
+        """
+        future = self.late.pop(key, None)
+        if future is not None:
+            return future, 0
+        return (
+            self.executors[notifier.name].submit(
+                notifier.send, message, key
+            ),
+            notifier.deadline
+        )
+
+    def deliver(self, items: List[Tuple[str, str, str]]) -> List[bool]:
+        """Доставляет пары (канал, сообщение, ключ) одновременно.
+
+        Медленный канал ограничен своим таймаутом и не задерживает
+        доставку в остальные.
+        """
+        futures = []
+        for channel, message, key in items:
+            notifier = self.notifiers.get(channel)
+            if notifier is None:
+                logger.error(f'Неизвестный канал доставки {channel}')
+                futures.append((None, key, None, 0))
+                continue
+            futures.append((notifier, key, *self.submit(
+                notifier, message, key
+            )))
+        results = []
+        for notifier, key, future, timeout in futures:
+            if future is None:
+                results.append(False)
+                continue
+            try:
+                results.append(future.result(timeout=timeout))
+            except FutureTimeout:
+                logger.error(f'Канал {notifier.name}: превышено время '
+                             f'доставки {notifier.deadline} с., сообщение '
+                             f'{key} еще может быть доставлено')
+                self.late[key] = future
+                results.append(False)
+        return results
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Останавливает пулы потоков всех каналов."""
+        for executor in self.executors.values():
+            executor.shutdown(wait=wait)
+
+    def metrics(self) -> dict:
+        """Возвращает метрики всех каналов."""
+        return {
+            name: notifier.metrics.as_dict()
+            for name, notifier in self.notifiers.items()
+        }
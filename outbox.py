@@ -0,0 +1,239 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from memory import BoundedCache
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE = 5
+RETRY_MAX = 60 * 60
+DISPATCH_INTERVAL = 10
+DISPATCH_BATCH = 50
+DEFAULT_CHANNELS = ('telegram',)
+DELIVERY_FAILED = 'delivery failed'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS state (
+    tenant TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    tenant TEXT NOT NULL,
+    channel TEXT NOT NULL DEFAULT 'telegram',
+    message TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    delivered_at REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_pending
+    ON outbox (delivered_at, next_attempt_at);
+'''
+
+
+def make_key(tenant: str, homework: dict, status: str) -> str:
+    """Возвращает ключ идемпотентности для смены статуса работы."""
+    parts = (
+        str(tenant),
+        str(homework.get('id', homework.get('homework_name'))),
+        status,
+        str(homework.get('date_updated', '')),
+    )
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+
+class Outbox:
+    """Хранит состояние и ожидающие отправки сообщения в одной базе."""
+
+    def __init__(self, path: str, clock: Callable[[], float] = time.time,
+                 states: Optional[BoundedCache] = None,
+                 channels: Iterable[str] = DEFAULT_CHANNELS):
+        self.clock = clock
+        self.channels = tuple(channels)
+        self.states = states if states is not None else BoundedCache()
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+        self.migrate()
+
+    def migrate(self) -> None:
+        """Добавляет колонку channel в базы, созданные до ее появления."""
+        columns = {
+            row[1] for row in
+            self.connection.execute('PRAGMA table_info(outbox)')
+        }
+        if 'channel' not in columns:
+            with self.connection:
+                self.connection.execute(
+                    "ALTER TABLE outbox ADD COLUMN "
+                    "channel TEXT NOT NULL DEFAULT 'telegram'"
+                )
+
+    def get_state(self, tenant: str) -> Optional[str]:
+        """Возвращает последний сохраненный статус пользователя."""
+        with self.lock:
+            status = self.states.get(tenant)
+            if status is not None:
+                return status
+            row = self.connection.execute(
+                'SELECT status FROM state WHERE tenant = ?', (tenant,)
+            ).fetchone()
+            if row:
+                self.states.set(tenant, row[0])
+        return row[0] if row else None
+
+    def record(self, tenant: str, status: str, message: str, key: str,
+               in_transaction: Optional[
+                   Callable[[sqlite3.Connection], None]
+               ] = None) -> bool:
+        """Одной транзакцией сохраняет новый статус и сообщения о нем.
+
+        Для каждого канала доставки записывается своё сообщение.
+        Если сообщения записаны, в той же транзакции вызывается
+        in_transaction(connection); его ошибка откатывает всю запись.
+        Возвращает False, если сообщения с таким ключом уже были записаны.
+        """
+        now = self.clock()
+        with self.lock, self.connection:
+            self.connection.execute(
+                'INSERT INTO state (tenant, status, updated_at) '
+                'VALUES (?, ?, ?) ON CONFLICT (tenant) DO UPDATE '
+                'SET status = excluded.status, '
+                'updated_at = excluded.updated_at',
+                (tenant, status, now)
+            )
+            inserted = self.connection.total_changes
+            self.connection.executemany(
+                'INSERT OR IGNORE INTO outbox (idempotency_key, tenant, '
+                'channel, message, created_at, next_attempt_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                ((f'{key}:{channel}', tenant, channel, message, now, now)
+                 for channel in self.channels)
+            )
+            inserted = self.connection.total_changes - inserted
+            if inserted and in_transaction is not None:
+                in_transaction(self.connection)
+            self.states.set(tenant, status)
+        return inserted > 0
+
+    def pending(self, limit: int = DISPATCH_BATCH) -> list:
+        """Возвращает сообщения, время отправки которых наступило."""
+        with self.lock:
+            return self.connection.execute(
+                'SELECT id, idempotency_key, channel, message, attempts '
+                'FROM outbox WHERE delivered_at IS NULL '
+                'AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?',
+                (self.clock(), limit)
+            ).fetchall()
+
+    def mark_delivered(self, message_id: int) -> None:
+        """Отмечает сообщение как доставленное."""
+        with self.lock, self.connection:
+            self.connection.execute(
+                'UPDATE outbox SET delivered_at = ? WHERE id = ?',
+                (self.clock(), message_id)
+            )
+
+    def mark_failed(self, message_id: int, attempts: int,
+                    error: str = '') -> None:
+        """Откладывает повторную отправку с экспоненциальной задержкой."""
+        delay = min(RETRY_BASE * 2 ** attempts, RETRY_MAX)
+        with self.lock, self.connection:
+            self.connection.execute(
+                'UPDATE outbox SET attempts = ?, next_attempt_at = ?, '
+                'last_error = ? WHERE id = ?',
+                (attempts + 1, self.clock() + delay, error, message_id)
+            )
+
+    def stats(self) -> dict:
+        """Возвращает глубину очереди и возраст самого старого сообщения."""
+        with self.lock:
+            depth, oldest = self.connection.execute(
+                'SELECT COUNT(*), MIN(created_at) FROM outbox '
+                'WHERE delivered_at IS NULL'
+            ).fetchone()
+        age = self.clock() - oldest if oldest is not None else 0.0
+        return {'depth': depth, 'oldest_age': age}
+
+    def close(self) -> None:
+        """Закрывает соединение с базой."""
+        with self.lock:
+            self.connection.close()
+
+
+class OutboxDispatcher(threading.Thread):
+    """Фоновая доставка сообщений из outbox, хотя бы один раз."""
+
+    def __init__(self, outbox: Outbox,
+                 deliver: Callable[[List[Tuple[str, str, str]]], List[bool]],
+                 interval: float = DISPATCH_INTERVAL):
+        super().__init__(name='outbox-dispatcher', daemon=True)
+        self.outbox = outbox
+        self.deliver = deliver
+        self.interval = interval
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+
+    def dispatch(self) -> int:
+        """Отправляет накопившиеся сообщения, возвращает число доставленных.
+
+        Сообщения пачки передаются в deliver вместе, чтобы каналы
+        доставки могли отправлять их параллельно.
+        """
+        rows = self.outbox.pending()
+        if not rows:
+            return 0
+        try:
+            results = self.deliver([
+                (channel, message, key)
+                for _, key, channel, message, _ in rows
+            ])
+            error = DELIVERY_FAILED
+        except Exception as exc:
+            results = [False] * len(rows)
+            error = str(exc)
+        delivered = 0
+        for (message_id, key, channel, _, attempts), sent in zip(
+            rows, results
+        ):
+            if sent:
+                self.outbox.mark_delivered(message_id)
+                delivered += 1
+            else:
+                logger.warning(f'Сообщение {key} не доставлено в канал '
+                               f'{channel}, попытка {attempts + 1}')
+                self.outbox.mark_failed(message_id, attempts, error)
+        return delivered
+
+    def wake(self) -> None:
+        """Запускает внеочередную доставку."""
+        self.wakeup.set()
+
+    def stop(self) -> None:
+        """Останавливает поток доставки."""
+        self.stopped.set()
+        self.wakeup.set()
+
+    def run(self):
+        """Цикл доставки до остановки потока."""
+        while not self.stopped.is_set():
+            try:
+                self.dispatch()
+                stats = self.outbox.stats()
+                if stats['depth']:
+                    logger.info(f'В очереди outbox {stats["depth"]} '
+                                f'сообщений, самому старому '
+                                f'{stats["oldest_age"]:.0f} с.')
+            except sqlite3.Error as error:
+                logger.error(f'Ошибка доставки из outbox: {error}')
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
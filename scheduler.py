@@ -0,0 +1,195 @@
+import heapq
+import itertools
+import logging
+import time
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = 0
+IDLE = 1
+TERMINAL = 2
+TERMINAL_STATUSES = ('approved',)
+
+OVERLOAD_AUTO = 'auto'
+OVERLOAD_ON = 'on'
+OVERLOAD_OFF = 'off'
+
+
+class PollScheduler:
+    """Очередь опросов с приоритетами и сбросом нагрузки.
+
+    Пользователи с работой на ревью или недавно сменившимся статусом
+    опрашиваются первыми. При перегрузке опросы простаивающих
+    пользователей откладываются, а пользователей с принятой работой
+    пропускаются до следующего планового опроса, но не больше max_skips
+    раз подряд, чтобы при OVERLOAD_MODE=on их все же опрашивали.
+
+    on_schedule(tenant, due) вызывается при каждом назначении опроса,
+    в том числе отложенного или пропущенного при перегрузке.
+    """
+
+    def __init__(self, interval: float, overload_lag: float,
+                 defer_interval: Optional[float] = None,
+                 recent_window: Optional[float] = None,
+                 overload_mode: str = OVERLOAD_AUTO,
+                 batch_size: int = 10,
+                 max_skips: int = 3,
+                 on_schedule: Optional[Callable[[str, float], None]] = None,
+                 clock: Callable[[], float] = time.time):
+        self.interval = interval
+        self.overload_lag = overload_lag
+        self.defer_interval = defer_interval or interval / 2
+        self.recent_window = recent_window or interval * 6
+        self.overload_mode = overload_mode
+        self.batch_size = batch_size
+        self.max_skips = max_skips
+        self.on_schedule = on_schedule
+        self.clock = clock
+        self.queue = []
+        self.due_at = {}
+        self.statuses = {}
+        self.changed_at = {}
+        self.skips = {}
+        self.counter = itertools.count()
+        self.overloaded = False
+        self.overloaded_until = 0.0
+        self.executed = 0
+        self.deferred = 0
+        self.shed = 0
+
+    def add(self, tenant: str, due: Optional[float] = None) -> None:
+        """Добавляет пользователя в расписание."""
+        self.schedule(tenant, self.clock() if due is None else due)
+
+    def schedule(self, tenant: str, due: float) -> None:
+        """Назначает время следующего опроса пользователя."""
+        self.due_at[tenant] = due
+        heapq.heappush(self.queue, (
+            due, self.priority(tenant), next(self.counter), tenant
+        ))
+        if self.on_schedule is not None:
+            self.on_schedule(tenant, due)
+
+    def remove(self, tenant: str) -> None:
+        """Убирает пользователя из расписания."""
+        self.due_at.pop(tenant, None)
+        self.statuses.pop(tenant, None)
+        self.changed_at.pop(tenant, None)
+        self.skips.pop(tenant, None)
+
+    def update(self, tenant: str, status: Optional[str],
+               changed: bool) -> None:
+        """Запоминает статус работы пользователя после опроса."""
+        self.statuses[tenant] = status
+        if changed:
+            self.changed_at[tenant] = self.clock()
+
+    def priority(self, tenant: str) -> int:
+        """Приоритет опроса: active, idle или terminal."""
+        status = self.statuses.get(tenant)
+        changed_at = self.changed_at.get(tenant)
+        if status == 'reviewing' or (
+            changed_at is not None
+            and self.clock() - changed_at < self.recent_window
+        ):
+            return ACTIVE
+        if status in TERMINAL_STATUSES:
+            return TERMINAL
+        return IDLE
+
+    def next_due(self, tenant: str) -> Optional[float]:
+        """Время следующего опроса пользователя."""
+        return self.due_at.get(tenant)
+
+    def pop_due(self) -> list:
+        """Снимает с очереди все наступившие опросы."""
+        now = self.clock()
+        due = []
+        while self.queue and self.queue[0][0] <= now:
+            planned, _, _, tenant = heapq.heappop(self.queue)
+            if self.due_at.get(tenant) == planned:
+                due.append((self.priority(tenant), planned, tenant))
+        return due
+
+    def check_overload(self, due: list) -> bool:
+        """Определяет перегрузку по отставанию самого старого опроса.
+
+        Обнаруженная перегрузка держится не меньше одного интервала
+        опроса, чтобы режим не переключался после каждой пачки.
+        """
+        now = self.clock()
+        if self.overload_mode == OVERLOAD_ON:
+            overloaded = True
+        elif self.overload_mode == OVERLOAD_OFF:
+            overloaded = False
+        else:
+            oldest = min((planned for _, planned, _ in due), default=now)
+            if now - oldest > self.overload_lag:
+                self.overloaded_until = now + self.interval
+            overloaded = now < self.overloaded_until
+        if overloaded != self.overloaded:
+            logger.warning('Планировщик: режим перегрузки '
+                           + ('включен' if overloaded else 'выключен'))
+        self.overloaded = overloaded
+        return overloaded
+
+    def due(self) -> List[str]:
+        """Возвращает пользователей для опроса в порядке приоритета.
+
+        За раз отдается не больше batch_size пользователей, остальные
+        возвращаются в очередь со своим плановым временем, чтобы
+        перегрузка оценивалась заново после каждой пачки.
+        """
+        due = self.pop_due()
+        overloaded = self.check_overload(due)
+        now = self.clock()
+        tenants = []
+        for priority, planned, tenant in sorted(due):
+            skippable = overloaded and (
+                self.skips.get(tenant, 0) < self.max_skips
+            )
+            if len(tenants) >= self.batch_size:
+                self.schedule(tenant, planned)
+            elif skippable and priority == TERMINAL:
+                self.shed += 1
+                self.skip(tenant, now + self.interval)
+            elif skippable and priority == IDLE:
+                self.deferred += 1
+                self.skip(tenant, now + self.defer_interval)
+            else:
+                tenants.append(tenant)
+        return tenants
+
+    def skip(self, tenant: str, due: float) -> None:
+        """Переносит опрос, пропущенный из-за перегрузки."""
+        self.skips[tenant] = self.skips.get(tenant, 0) + 1
+        self.schedule(tenant, due)
+
+    def complete(self, tenant: str) -> None:
+        """Планирует следующий опрос после выполненного."""
+        if tenant not in self.due_at:
+            return
+        self.executed += 1
+        self.skips.pop(tenant, None)
+        self.schedule(tenant, self.clock() + self.interval)
+
+    def sleep_time(self) -> float:
+        """Сколько можно спать до ближайшего опроса."""
+        while self.queue and (
+            self.due_at.get(self.queue[0][3]) != self.queue[0][0]
+        ):
+            heapq.heappop(self.queue)
+        if not self.queue:
+            return self.interval
+        return max(self.queue[0][0] - self.clock(), 0.0)
+
+    def metrics(self) -> dict:
+        """Счетчики выполненных, отложенных и пропущенных опросов."""
+        return {
+            'overloaded': self.overloaded,
+            'tenants': len(self.due_at),
+            'executed': self.executed,
+            'deferred': self.deferred,
+            'shed': self.shed,
+        }
@@ -0,0 +1,179 @@
+import hashlib
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left, insort
+from typing import Iterable, Iterator, Optional, Tuple
+
+MAGIC = b'HWST'
+VERSION = 2
+HEADER = struct.Struct('<4sHHI')
+ALIGN = 8
+UNKNOWN = 0
+
+
+def tenant_id(tenant: str) -> int:
+    """Переводит id чата в число; для @username берет стабильный хэш."""
+    try:
+        return int(tenant)
+    except ValueError:
+        digest = hashlib.blake2b(tenant.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'little', signed=True)
+
+
+def padded(size: int) -> int:
+    """Округляет размер вверх до границы выравнивания колонок."""
+    return (size + ALIGN - 1) // ALIGN * ALIGN
+
+
+class StateTable:
+    """Состояние пользователей в колонках-массивах, отсортированных по id.
+
+    Статусы хранятся однобайтовыми кодами: 0 - статус неизвестен,
+    дальше коды по порядку statuses. Снимок таблицы отображается
+    в память через mmap, поэтому запуск не требует разбора файла.
+    """
+
+    def __init__(self, statuses: Iterable[str]):
+        self.statuses = tuple(statuses)
+        self.codes = {
+            status: code for code, status in enumerate(self.statuses, 1)
+        }
+        self.tenants = array('q')
+        self.cursors = array('q')
+        self.next_polls = array('d')
+        self.status_codes = array('b')
+        self.mapped = None
+
+    def __len__(self):
+        return len(self.tenants)
+
+    def index(self, tenant_id: int) -> Optional[int]:
+        """Возвращает номер строки пользователя или None."""
+        position = bisect_left(self.tenants, tenant_id)
+        if position < len(self.tenants) and (
+            self.tenants[position] == tenant_id
+        ):
+            return position
+        return None
+
+    def materialize(self) -> None:
+        """Копирует отображенные колонки в обычные массивы."""
+        if self.mapped is None:
+            return
+        self.tenants = array('q', self.tenants)
+        self.cursors = array('q', self.cursors)
+        self.next_polls = array('d', self.next_polls)
+        self.status_codes = array('b', self.status_codes)
+        self.close()
+
+    def add(self, tenant_id: int, status: Optional[str] = None,
+            cursor: int = 0, next_poll: float = 0.0) -> int:
+        """Добавляет пользователя, если его еще нет, возвращает строку."""
+        position = self.index(tenant_id)
+        if position is not None:
+            return position
+        self.materialize()
+        insort(self.tenants, tenant_id)
+        position = self.index(tenant_id)
+        self.cursors.insert(position, cursor)
+        self.next_polls.insert(position, next_poll)
+        self.status_codes.insert(position, self.codes.get(status, UNKNOWN))
+        return position
+
+    def get(self, tenant_id: int) -> Optional[Tuple[str, int, float]]:
+        """Возвращает (статус, курсор, время следующего опроса)."""
+        position = self.index(tenant_id)
+        if position is None:
+            return None
+        return self.row(position)[1:]
+
+    def row(self, position: int) -> Tuple[int, Optional[str], int, float]:
+        """Возвращает строку таблицы по номеру."""
+        code = self.status_codes[position]
+        return (
+            self.tenants[position],
+            self.statuses[code - 1] if code else None,
+            self.cursors[position],
+            self.next_polls[position],
+        )
+
+    def rows(self) -> Iterator[Tuple[int, Optional[str], int, float]]:
+        """Перебирает строки таблицы по возрастанию id."""
+        for position in range(len(self.tenants)):
+            yield self.row(position)
+
+    def set_status(self, tenant_id: int, status: Optional[str]) -> None:
+        """Обновляет статус работы пользователя."""
+        position = self.add(tenant_id)
+        self.status_codes[position] = self.codes.get(status, UNKNOWN)
+
+    def set_cursor(self, tenant_id: int, cursor: int) -> None:
+        """Обновляет курсор from_date пользователя."""
+        self.cursors[self.add(tenant_id)] = cursor
+
+    def set_next_poll(self, tenant_id: int, next_poll: float) -> None:
+        """Обновляет время следующего опроса пользователя."""
+        self.next_polls[self.add(tenant_id)] = next_poll
+
+    def snapshot(self, path: str) -> None:
+        """Атомарно сохраняет таблицу в файл."""
+        statuses = '\n'.join(self.statuses).encode()
+        header = HEADER.pack(MAGIC, VERSION, len(statuses), len(self))
+        temporary = f'{path}.tmp'
+        with open(temporary, 'wb') as snapshot:
+            snapshot.write(header.ljust(padded(HEADER.size), b'\0'))
+            snapshot.write(statuses.ljust(padded(len(statuses)), b'\0'))
+            for column in (self.tenants, self.cursors, self.next_polls,
+                           self.status_codes):
+                snapshot.write(memoryview(column).cast('B'))
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path: str, statuses: Iterable[str]) -> 'StateTable':
+        """Отображает снимок в память без разбора и копирования.
+
+        Изменения существующих строк пишутся в приватную копию страниц
+        и попадают на диск только при следующем snapshot().
+        """
+        table = cls(statuses)
+        with open(path, 'rb') as snapshot:
+            mapped = mmap.mmap(
+                snapshot.fileno(), 0, access=mmap.ACCESS_COPY
+            )
+        magic, version, statuses_size, count = HEADER.unpack_from(mapped)
+        if magic != MAGIC or version != VERSION:
+            mapped.close()
+            raise ValueError(f'{path} не является снимком таблицы состояний')
+        offset = padded(HEADER.size)
+        saved = mapped[offset:offset + statuses_size].decode()
+        if tuple(saved.split('\n')) != table.statuses:
+            mapped.close()
+            raise ValueError(f'Статусы в снимке {path} не совпадают '
+                             f'с текущими')
+        offset += padded(statuses_size)
+        view = memoryview(mapped)
+        columns = []
+        for typecode in ('q', 'q', 'd', 'b'):
+            size = count * array(typecode).itemsize
+            columns.append(view[offset:offset + size].cast(typecode))
+            offset += size
+        (table.tenants, table.cursors, table.next_polls,
+         table.status_codes) = columns
+        table.mapped = mapped
+        return table
+
+    def close(self) -> None:
+        """Отпускает отображенный в память снимок."""
+        if self.mapped is None:
+            return
+        mapped, self.mapped = self.mapped, None
+        if isinstance(self.tenants, memoryview):
+            self.tenants = array('q')
+            self.cursors = array('q')
+            self.next_polls = array('d')
+            self.status_codes = array('b')
+        mapped.close()
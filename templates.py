@@ -0,0 +1,102 @@
+import json
+import logging
+from os import listdir
+from os.path import abspath, dirname, join, splitext
+from typing import Dict, List, Optional
+
+from memory import BoundedCache
+
+logger = logging.getLogger(__name__)
+
+LOCALES_DIR = join(dirname(abspath(__file__)), 'locales')
+DEFAULT_LOCALE = 'ru'
+# Символ, которого не бывает в шаблонах: по нему шаблон режется на
+# неизменные куски вокруг подставляемого значения
+SLOT = '\0'
+
+
+def compile_template(template: str, field: str, **static) -> List[str]:
+    """Подставляет известные заранее поля и режет шаблон по полю field.
+
+    Готовое сообщение потом собирается одним str.join.
+    """
+    return template.format(**static, **{field: SLOT}).split(SLOT)
+
+
+class Templates:
+    """Шаблоны сообщений на разных языках.
+
+    Файлы locales/*.json читаются один раз, вердикты заранее подставляются
+    в шаблон, а готовые сообщения кэшируются по (язык, работа, статус).
+    """
+
+    def __init__(self, directory: str = LOCALES_DIR,
+                 default_locale: str = DEFAULT_LOCALE,
+                 cache: Optional[BoundedCache] = None):
+        self.default_locale = default_locale
+        self.cache = cache if cache is not None else BoundedCache()
+        self.verdicts: Dict[str, Dict[str, str]] = {}
+        self.statuses: Dict[tuple, List[str]] = {}
+        self.errors: Dict[str, List[str]] = {}
+        self.recoveries: Dict[str, str] = {}
+        for name in sorted(listdir(directory)):
+            locale, extension = splitext(name)
+            if extension == '.json':
+                with open(join(directory, name), encoding='utf-8') as file:
+                    self.compile(locale, json.load(file))
+        if default_locale not in self.recoveries:
+            raise ValueError(f'Нет шаблонов для языка {default_locale}')
+
+    def compile(self, locale: str, texts: dict) -> None:
+        """Заранее собирает шаблоны одного языка."""
+        self.verdicts[locale] = dict(texts['verdicts'])
+        for status, verdict in texts['verdicts'].items():
+            self.statuses[locale, status] = compile_template(
+                texts['status_changed'], 'homework_name', verdict=verdict
+            )
+        self.errors[locale] = compile_template(texts['error'], 'error')
+        self.recoveries[locale] = texts['recovery']
+
+    def locale(self, locale: Optional[str]) -> str:
+        """Возвращает язык, если для него есть шаблоны, иначе основной."""
+        if locale in self.recoveries:
+            return locale
+        if locale:
+            logger.warning(f'Нет шаблонов для языка {locale}, '
+                           f'используется {self.default_locale}')
+        return self.default_locale
+
+    def resolve_locales(self, locales: Dict[str, str]) -> Dict[str, str]:
+        """Проверяет языки пользователей один раз при запуске.
+
+        Пользователям с языком без шаблонов назначается основной язык,
+        чтобы предупреждение не повторялось при каждом сообщении.
+        """
+        resolved = {}
+        for tenant, locale in locales.items():
+            if locale not in self.recoveries:
+                logger.warning(f'Нет шаблонов для языка {locale} '
+                               f'пользователя {tenant}, используется '
+                               f'{self.default_locale}')
+                locale = self.default_locale
+            resolved[tenant] = locale
+        return resolved
+
+    def render_status(self, homework_name: str, status: str,
+                      locale: Optional[str] = None) -> str:
+        """Сообщение о смене статуса работы."""
+        key = (locale, homework_name, status)
+        message = self.cache.get(key)
+        if message is None:
+            parts = self.statuses[self.locale(locale), status]
+            message = homework_name.join(parts)
+            self.cache.set(key, message)
+        return message
+
+    def render_error(self, error, locale: Optional[str] = None) -> str:
+        """Сообщение о сбое в работе бота."""
+        return str(error).join(self.errors[self.locale(locale)])
+
+    def render_recovery(self, locale: Optional[str] = None) -> str:
+        """Сообщение о восстановлении работы бота."""
+        return self.recoveries[self.locale(locale)]
@@ -0,0 +1,109 @@
+import pytest
+
+import homework
+from chaos import ChaosConfig, ChaosThresholds, FakeApi, main, run_chaos
+
+
+@pytest.fixture
+def chaos(monkeypatch):
+    """Запускает прогон, направив опрос homework на фейковый API."""
+    def run(config):
+        api = FakeApi(config)
+        monkeypatch.setattr(homework, 'ENDPOINT', api.url)
+        monkeypatch.setattr(homework, 'REQUEST_TIMEOUT', config.timeout)
+        api.start()
+        try:
+            return run_chaos(config, api)
+        finally:
+            api.stop()
+
+    return run
+
+
+class TestChaos:
+
+    def test_clean_run(self, chaos):
+        report = chaos(ChaosConfig(cycles=40))
+        assert report.requests == 40
+        assert report.wasted_requests == 0
+        assert report.recoveries == []
+        assert report.expected == report.delivered == 4
+        assert report.passed(ChaosThresholds())
+
+    def test_recovers_under_faults(self, chaos):
+        config = ChaosConfig(
+            latency=0.03, reset=0.05, malformed_json=0.05,
+            missing_homeworks=0.05, missing_current_date=0.05,
+            unknown_status=0.05, cycles=160, seed=1
+        )
+        report = chaos(config)
+        assert sum(report.faults.values()) > 0
+        assert report.wasted_requests > 0
+        thresholds = ChaosThresholds(max_recovery_seconds=3600,
+                                     max_wasted_ratio=0.5)
+        assert report.passed(thresholds), (
+            'Конвейер опроса не уложился в пороги: '
+            + ', '.join(report.failures(thresholds))
+        )
+
+    def test_thresholds_catch_outage(self, chaos):
+        report = chaos(ChaosConfig(unknown_status=1.0, cycles=20))
+        failures = report.failures(ChaosThresholds())
+        assert report.lost == 2
+        assert report.breaker_opens == 0, (
+            'Ошибки разбора ответа не должны размыкать цепь'
+        )
+        assert report.skipped_polls == 0
+        assert report.requests == 20
+        assert report.max_recovery_seconds == 20 * 600
+        assert len(failures) == 3, (
+            'Полный отказ должен нарушать пороги восстановления, '
+            'потерь и доли пустых запросов'
+        )
+
+    def test_transport_outage_opens_breaker(self, chaos):
+        report = chaos(ChaosConfig(reset=1.0, cycles=20))
+        assert report.breaker_opens > 0
+        assert report.skipped_polls > 0
+        assert report.requests < 20, (
+            'При разомкнутой цепи API не должно запрашиваться'
+        )
+
+    def test_delivery_faults_are_retried_once(self, chaos):
+        report = chaos(ChaosConfig(
+            delivery_failure=0.3, late_delivery=0.3, cycles=80, seed=2
+        ))
+        assert report.faults['delivery_failure'] > 0
+        assert report.faults['late_delivery'] > 0
+        assert report.lost == 0, 'Сбойные доставки должны повторяться'
+        assert report.duplicates == 0, (
+            'Опоздавшая доставка не должна отправляться повторно'
+        )
+        assert report.delivered == report.expected == 8
+
+    def test_duplicates_counted_by_sent_notifications(self, chaos,
+                                                      monkeypatch):
+        from notifiers import FanOut
+
+        def submit_again(self, notifier, message, key):
+            return self.executors[notifier.name].submit(
+                notifier.send, message, key
+            ), notifier.deadline
+
+        monkeypatch.setattr(FanOut, 'submit', submit_again)
+        report = chaos(ChaosConfig(late_delivery=1.0, cycles=10))
+        assert report.duplicates > 0, (
+            'Повторная отправка опоздавшего сообщения должна считаться '
+            'дубликатом'
+        )
+
+    def test_cli(self, capsys, monkeypatch):
+        monkeypatch.setattr(homework, 'ENDPOINT', homework.ENDPOINT)
+        monkeypatch.setattr(homework, 'REQUEST_TIMEOUT',
+                            homework.REQUEST_TIMEOUT)
+        code = main(['--cycles', '20', '--latency', '0', '--reset', '0',
+                     '--malformed-json', '0', '--missing-homeworks', '0',
+                     '--missing-current-date', '0', '--unknown-status', '0',
+                     '--delivery-failure', '0', '--late-delivery', '0'])
+        assert code == 0
+        assert 'потеряно 0' in capsys.readouterr().out
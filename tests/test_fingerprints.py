@@ -0,0 +1,82 @@
+from http import HTTPStatus
+
+import requests
+
+from fingerprints import PayloadFingerprints
+from utils import FakeResponse
+
+
+def answer(status, current_date):
+    return {
+        'homeworks': [{'homework_name': 'hw1', 'status': status}],
+        'current_date': current_date,
+    }
+
+
+class TestPayloadFingerprints:
+
+    def test_same_body_is_hit(self):
+        fingerprints = PayloadFingerprints()
+        first = FakeResponse(answer('reviewing', 1))
+        assert not fingerprints.unchanged('1', first)
+        fingerprints.remember('1', first, cpu=0.01)
+        assert fingerprints.unchanged(
+            '1', FakeResponse(answer('reviewing', 2))
+        ), 'Изменение только current_date не должно считаться изменением'
+        assert not fingerprints.unchanged(
+            '1', FakeResponse(answer('approved', 3))
+        )
+        assert not fingerprints.unchanged(
+            '2', FakeResponse(answer('reviewing', 2))
+        )
+        stats = fingerprints.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 3
+        assert stats['hit_rate'] == 0.25
+        assert stats['cpu_saved'] > 0
+
+    def test_etag(self):
+        fingerprints = PayloadFingerprints()
+        assert fingerprints.headers('1') == {}
+        response = FakeResponse(answer('reviewing', 1), etag='"abc"')
+        fingerprints.unchanged('1', response)
+        fingerprints.remember('1', response)
+        assert fingerprints.headers('1') == {'If-None-Match': '"abc"'}
+        assert fingerprints.unchanged(
+            '1', FakeResponse(status_code=HTTPStatus.NOT_MODIFIED)
+        )
+
+    def test_check_homework_skips_parsing(self, monkeypatch, tmp_path):
+        import homework
+        from history import HistoryStore
+        from outbox import Outbox
+
+        responses = [
+            FakeResponse(answer('reviewing', 1)),
+            FakeResponse(answer('reviewing', 2)),
+            FakeResponse(answer('approved', 3)),
+        ]
+        monkeypatch.setattr(
+            requests, 'get', lambda *args, **kwargs: responses.pop(0)
+        )
+        checked = []
+        check_response = homework.check_response
+
+        def counting_check_response(response):
+            checked.append(response)
+            return check_response(response)
+
+        monkeypatch.setattr(homework, 'check_response',
+                            counting_check_response)
+        path = str(tmp_path / 'db.sqlite3')
+        outbox, history = Outbox(path), HistoryStore(path)
+        fingerprints = PayloadFingerprints()
+        assert homework.check_homework(outbox, history, '1', 0, fingerprints)
+        assert not homework.check_homework(
+            outbox, history, '1', 0, fingerprints
+        )
+        assert homework.check_homework(outbox, history, '1', 0, fingerprints)
+        assert len(checked) == 2, (
+            'Неизменившийся ответ не должен разбираться и проверяться'
+        )
+        assert outbox.get_state('1') == 'approved'
@@ -0,0 +1,208 @@
+from http import HTTPStatus
+
+import pytest
+
+from exceptions import BadReturnAnswer, ServerError, TooManyRequests
+from governor import TENANT_WINDOW, RequestGovernor, parse_retry_after
+from utils import FakeClock, FakeResponse
+
+
+def make_governor(clock, **kwargs):
+    return RequestGovernor(clock=clock, sleep=clock.sleep, **kwargs)
+
+
+class TestRequestGovernor:
+
+    def test_parse_retry_after(self):
+        assert parse_retry_after('120') == 120
+        assert parse_retry_after(
+            'Wed, 21 Oct 2015 07:28:00 GMT', now=1445412470
+        ) == 10
+        assert parse_retry_after('soon') is None
+        assert parse_retry_after(None) is None
+
+    def test_caps_rate(self):
+        clock = FakeClock()
+        governor = make_governor(clock, max_rate=2, burst=2)
+        started = clock.now
+        for _ in range(10):
+            assert governor.acquire('1', timeout=10)
+        assert clock.now - started == pytest.approx(4.5), (
+            'После исчерпания запаса запросы должны идти не чаще лимита'
+        )
+        assert not governor.acquire('1', timeout=0)
+        assert governor.stats()['throttled'] == 1
+
+    def test_penalize_and_retry_after(self):
+        clock = FakeClock()
+        governor = make_governor(clock, max_rate=1, burst=1)
+        governor.penalize(retry_after=30)
+        assert governor.stats()['rate'] == 0.5
+        assert governor.reserve('1') == 30
+        clock.now += 30
+        assert governor.reserve('1') == 0
+        for _ in range(20):
+            governor.reward()
+        assert governor.stats()['rate'] == 1, (
+            'Лимит не должен превышать максимальный'
+        )
+
+    def test_fair_share(self):
+        clock = FakeClock()
+        governor = make_governor(clock, max_rate=10, burst=10)
+        granted = {'a': 0, 'b': 0}
+        for _ in range(200):
+            for tenant in granted:
+                if governor.reserve(tenant) == 0:
+                    granted[tenant] += 1
+            clock.now += 0.05
+        assert abs(granted['a'] - granted['b']) <= 1
+        assert sum(granted.values()) <= 10 * 10 + 10
+
+    def test_fair_share_many_tenants(self):
+        clock = FakeClock()
+        governor = make_governor(clock, max_rate=10, burst=10)
+        tenants = [str(number) for number in range(2000)]
+        for tenant in tenants:
+            governor.reserve(tenant)
+        assert governor.stats()['tenants'] == 2000, (
+            'Активные пользователи не должны вытесняться по размеру'
+        )
+        assert governor.reserve(tenants[0]) == pytest.approx(
+            2000 / 10, rel=0.01
+        ), 'Доля пользователя должна делиться на всех активных'
+        clock.now += TENANT_WINDOW
+        governor.reserve(tenants[0])
+        assert governor.stats()['tenants'] == 1, (
+            'Пользователи без запросов дольше окна перестают быть активными'
+        )
+
+    def test_server_error_retry_after_blocks(self, monkeypatch, tmp_path):
+        import requests
+
+        import homework
+        from breaker import CircuitBreaker
+        from health import HealthMonitor
+        from history import HistoryStore
+        from outbox import Outbox
+
+        monkeypatch.setattr(
+            requests, 'get', lambda *args, **kwargs: FakeResponse(
+                status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '300'}
+            )
+        )
+        clock = FakeClock()
+        governor = make_governor(clock, max_rate=1, burst=1)
+        path = str(tmp_path / 'poll.sqlite3')
+        with pytest.raises(ServerError):
+            homework.poll(
+                Outbox(path, clock=clock), HistoryStore(path),
+                CircuitBreaker(clock=clock), HealthMonitor(60, clock=clock),
+                '1', 0, governor=governor
+            )
+        assert governor.reserve('2') == pytest.approx(300), (
+            'Retry-After из ответа 503 должен приостанавливать запросы'
+        )
+
+    def test_shared_store(self, tmp_path):
+        clock = FakeClock()
+        path = str(tmp_path / 'governor.sqlite3')
+        first = make_governor(clock, max_rate=1, burst=2, store_path=path)
+        second = make_governor(clock, max_rate=1, burst=2, store_path=path)
+        assert first.reserve('1') == 0
+        assert second.reserve('2') == 0
+        assert second.reserve('3') > 0, (
+            'Процессы должны делить общий лимит'
+        )
+        first.penalize(retry_after=60)
+        assert second.reserve('4') == pytest.approx(60)
+
+    def test_check_status(self):
+        import homework
+
+        with pytest.raises(TooManyRequests) as error:
+            homework.check_status(
+                FakeResponse(status_code=HTTPStatus.TOO_MANY_REQUESTS,
+                             headers={'Retry-After': '42'}),
+                (HTTPStatus.OK,)
+            )
+        assert error.value.retry_after == 42
+        with pytest.raises(ServerError) as error:
+            homework.check_status(
+                FakeResponse(status_code=HTTPStatus.BAD_GATEWAY),
+                (HTTPStatus.OK,)
+            )
+        assert error.value.retry_after is None
+        with pytest.raises(ServerError) as error:
+            homework.check_status(
+                FakeResponse(status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+                             headers={'Retry-After': '120'}),
+                (HTTPStatus.OK,)
+            )
+        assert error.value.retry_after == 120, (
+            'Retry-After из ответа 503 должен передаваться в исключении'
+        )
+        with pytest.raises(BadReturnAnswer):
+            homework.check_status(
+                FakeResponse(status_code=HTTPStatus.NOT_FOUND),
+                (HTTPStatus.OK,)
+            )
+
+    def test_skipped_poll(self, monkeypatch, tmp_path):
+        import requests
+
+        import homework
+        from breaker import CircuitBreaker
+        from health import HealthMonitor
+        from history import HistoryStore
+        from outbox import Outbox
+
+        def fail(*args, **kwargs):
+            raise AssertionError('Пропущенный опрос не должен обращаться к API')
+
+        monkeypatch.setattr(requests, 'get', fail)
+        clock = FakeClock()
+        path = str(tmp_path / 'poll.sqlite3')
+        outbox, history = Outbox(path, clock=clock), HistoryStore(path)
+        monitor = HealthMonitor(60, clock=clock)
+        breaker = CircuitBreaker(1, 100, clock=clock)
+        breaker.failure()
+        assert homework.poll(
+            outbox, history, breaker, monitor, '1', 0
+        ) is None, 'Опрос при разомкнутой цепи не должен считаться успешным'
+        governor = make_governor(clock, max_rate=0.01, burst=1)
+        assert governor.acquire('1')
+        assert homework.poll(
+            outbox, history, CircuitBreaker(clock=clock), monitor, '1', 0,
+            governor=governor
+        ) is None, 'Опрос сверх лимита не должен считаться успешным'
+        assert '1' not in monitor.successes
+
+    def test_validation_error_keeps_breaker_closed(self, monkeypatch,
+                                                   tmp_path):
+        import requests
+
+        import homework
+        from breaker import CLOSED, CircuitBreaker
+        from health import HealthMonitor
+        from history import HistoryStore
+        from outbox import Outbox
+
+        answer = {'homeworks': [{'homework_name': 'hw', 'status': 'weird'}],
+                  'current_date': 0}
+        monkeypatch.setattr(
+            requests, 'get', lambda *args, **kwargs: FakeResponse(answer)
+        )
+        clock = FakeClock()
+        path = str(tmp_path / 'poll.sqlite3')
+        outbox, history = Outbox(path, clock=clock), HistoryStore(path)
+        monitor = HealthMonitor(60, clock=clock)
+        breaker = CircuitBreaker(5, 1800, clock=clock)
+        for _ in range(5):
+            with pytest.raises(KeyError):
+                homework.poll(outbox, history, breaker, monitor, '1', 0)
+        assert breaker.state == CLOSED, (
+            'Ошибка в ответе одного пользователя не должна останавливать '
+            'опрос остальных'
+        )
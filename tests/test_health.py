@@ -0,0 +1,105 @@
+import json
+import urllib.error
+import urllib.request
+
+from breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from health import HealthMonitor, start_health_server
+from utils import FakeClock
+
+
+def fetch(server):
+    url = f'http://127.0.0.1:{server.server_port}/health'
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        return error.code, json.loads(error.read())
+
+
+class TestHealthMonitor:
+
+    def test_lag_grows_while_poll_not_started(self):
+        clock = FakeClock()
+        monitor = HealthMonitor(60, clock=clock)
+        monitor.poll_planned('1', clock.now)
+        clock.now += 30
+        assert monitor.status()['healthy']
+        clock.now += 31
+        status = monitor.status()
+        assert not status['healthy'], (
+            'Зависший цикл опроса должен делать бота нездоровым'
+        )
+        assert status['tenants']['1']['lag'] == 61
+
+    def test_lag_measured_at_start(self):
+        clock = FakeClock()
+        monitor = HealthMonitor(60, clock=clock)
+        monitor.poll_planned('1', clock.now)
+        clock.now += 5
+        monitor.poll_started('1')
+        monitor.poll_succeeded('1')
+        monitor.poll_finished('1')
+        clock.now += 100
+        tenant = monitor.status()['tenants']['1']
+        assert tenant == {'lag': 5, 'since_success': 100}
+
+    def test_lag_grows_while_poll_hangs(self):
+        clock = FakeClock()
+        monitor = HealthMonitor(60, clock=clock)
+        monitor.poll_planned('1', clock.now)
+        clock.now += 5
+        monitor.poll_started('1')
+        clock.now += 30
+        assert monitor.status()['tenants']['1']['lag'] == 35
+        clock.now += 100000
+        status = monitor.status()
+        assert not status['healthy'], (
+            'Опрос, который начался и не завершился, должен делать '
+            'бота нездоровым'
+        )
+        assert status['tenants']['1']['lag'] == 100035
+
+    def test_endpoint(self):
+        clock = FakeClock()
+        monitor = HealthMonitor(
+            60, queue=lambda: {'depth': 2, 'oldest_age': 10.0},
+            breaker=lambda: CLOSED,
+            notifiers=lambda: {'telegram': {'sent': 1, 'attempts': 2}},
+            clock=clock
+        )
+        monitor.poll_planned('1', clock.now)
+        server = start_health_server(monitor, '127.0.0.1', 0)
+        try:
+            code, body = fetch(server)
+            assert code == 200
+            assert body['outbox']['depth'] == 2
+            assert body['breaker'] == CLOSED
+            assert body['notifiers']['telegram']['attempts'] == 2
+            clock.now += 120
+            code, body = fetch(server)
+            assert code == 503
+            assert not body['healthy']
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestCircuitBreaker:
+
+    def test_opens_and_recovers(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(2, 100, clock=clock)
+        breaker.failure()
+        assert breaker.state == CLOSED
+        breaker.failure()
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+        clock.now += 100
+        assert breaker.state == HALF_OPEN
+        breaker.failure()
+        assert breaker.state == OPEN, (
+            'Ошибка в полуоткрытом состоянии снова размыкает цепь'
+        )
+        clock.now += 100
+        breaker.success()
+        assert breaker.state == CLOSED
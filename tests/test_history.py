@@ -0,0 +1,118 @@
+import sqlite3
+
+import pytest
+
+from history import (SCHEMA, TURNAROUND_QUERY, HistoryStore, main,
+                     parse_timestamp)
+
+DAY = 24 * 60 * 60
+
+
+class TestHistory:
+
+    def test_parse_timestamp(self):
+        assert parse_timestamp('2020-02-13T14:40:57Z') == 1581604857
+        assert parse_timestamp('') is None
+        assert parse_timestamp('13.02.2020') is None
+
+    def test_record_uses_date_updated(self, tmp_path):
+        store = HistoryStore(str(tmp_path / 'history.sqlite3'))
+        store.record('1', {
+            'homework_name': 'hw1',
+            'date_updated': '2020-02-13T14:40:57Z',
+        }, 'reviewing')
+        row = store.connection.execute(
+            'SELECT tenant, homework, status, ts FROM transitions'
+        ).fetchone()
+        assert row == ('1', 'hw1', 1, 1581604857)
+
+    def test_report_percentiles(self, tmp_path):
+        store = HistoryStore(str(tmp_path / 'history.sqlite3'))
+        rows = []
+        for number in range(1, 101):
+            start = number * DAY
+            rows.append(('1', f'hw{number}', 'reviewing', start))
+            rows.append(('1', f'hw{number}', 'approved', start + number))
+        rows.append(('2', 'hw1', 'approved', DAY))
+        store.record_many(rows)
+        report = store.report(period='month')
+        assert sum(row['count'] for row in report.values()) == 100, (
+            'Учитываться должны только переходы reviewing -> вердикт'
+        )
+        january = report['1970-01']
+        assert january['p50'] == 15
+        assert january['p99'] == 30
+
+    def test_report_by_homework(self, tmp_path):
+        store = HistoryStore(str(tmp_path / 'history.sqlite3'))
+        store.record_many([
+            ('1', 'hw1', 'reviewing', 0),
+            ('1', 'hw1', 'rejected', 100),
+            ('1', 'hw1', 'reviewing', 200),
+            ('1', 'hw1', 'approved', 500),
+            ('2', 'hw1', 'reviewing', 0),
+            ('2', 'hw1', 'approved', 50),
+        ])
+        report = store.report(by_homework=True)
+        assert report == {'hw1': {'count': 3, 'p50': 100,
+                                  'p90': 300, 'p99': 300}}
+
+    def test_since_keeps_reviews_started_before_cutoff(self, tmp_path):
+        store = HistoryStore(str(tmp_path / 'history.sqlite3'))
+        store.record_many([
+            ('1', 'hw1', 'reviewing', 0),
+            ('1', 'hw1', 'approved', 2 * DAY),
+            ('1', 'hw2', 'reviewing', 0),
+            ('1', 'hw2', 'approved', DAY // 2),
+        ])
+        report = store.report(by_homework=True, since=DAY)
+        assert report == {'hw1': {'count': 1, 'p50': 2 * DAY,
+                                  'p90': 2 * DAY, 'p99': 2 * DAY}}, (
+            'Ревью, начатое до границы и завершенное после, должно '
+            'учитываться'
+        )
+
+    def test_since_uses_ts_index(self, tmp_path):
+        store = HistoryStore(str(tmp_path / 'history.sqlite3'))
+        plan = ' '.join(row[3] for row in store.connection.execute(
+            'EXPLAIN QUERY PLAN ' + TURNAROUND_QUERY, (DAY,) * 7
+        ))
+        assert 'transitions_ts' in plan
+        assert 'SCAN transitions' not in plan, (
+            'Отчет за период не должен читать всю историю'
+        )
+
+    def test_transition_is_written_with_state(self, tmp_path):
+        import homework
+        from outbox import Outbox
+
+        path = str(tmp_path / 'db.sqlite3')
+        outbox, store = Outbox(path), HistoryStore(path)
+        response = {
+            'homeworks': [{'homework_name': 'hw1', 'status': 'approved'}],
+            'current_date': 0,
+        }
+        store.connection.execute('DROP TABLE transitions')
+        with pytest.raises(sqlite3.OperationalError):
+            homework.process_answer(outbox, store, '1', response)
+        assert outbox.get_state('1') is None, (
+            'Без записи в историю статус не должен сохраняться'
+        )
+        assert outbox.stats()['depth'] == 0
+        store.connection.executescript(SCHEMA)
+        assert homework.process_answer(outbox, store, '1', response)
+        assert outbox.get_state('1') == 'approved'
+        assert store.connection.execute(
+            'SELECT COUNT(*) FROM transitions'
+        ).fetchone()[0] == 1
+
+    def test_cli(self, tmp_path, capsys):
+        path = str(tmp_path / 'history.sqlite3')
+        store = HistoryStore(path)
+        store.record_many([
+            ('1', 'hw1', 'reviewing', 0),
+            ('1', 'hw1', 'approved', 3600),
+        ])
+        store.close()
+        main(['--db', path, '--period', 'day'])
+        assert 'p50=1.0 ч' in capsys.readouterr().out
@@ -0,0 +1,144 @@
+import gc
+import tracemalloc
+
+import requests
+
+from memory import BoundedCache, MemoryTracer, current_rss
+from utils import FakeClock, FakeResponse
+
+RETRY_TIME = 600
+MONTH = 30 * 24 * 60 * 60
+RSS_GROWTH_LIMIT = 4 * 1024 * 1024
+TENANTS = 4
+CACHE_SIZE = 2
+
+
+class TestBoundedCache:
+
+    def test_lru_eviction(self):
+        cache = BoundedCache(max_size=2, ttl=None)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        assert 'b' not in cache, 'Вытесняться должна самая старая запись'
+        assert cache.get('a') == 1
+        assert len(cache) == 2
+        assert cache.evictions == 1
+
+    def test_ttl_expiration(self):
+        clock = FakeClock()
+        cache = BoundedCache(max_size=10, ttl=60, clock=clock)
+        cache.set('a', 1)
+        clock.now += 59
+        assert cache.get('a') == 1
+        clock.now += 1
+        assert cache.get('a') is None
+        assert len(cache) == 0
+
+
+class TestMemoryTracer:
+
+    def test_snapshot_diff(self):
+        tracer = MemoryTracer(interval=60)
+        assert tracer.snapshot() == [], 'Первый снимок только включает трассировку'
+        garbage = [str(number) * 10 for number in range(1000)]
+        assert tracer.snapshot(), 'Второй снимок должен содержать разницу'
+        del garbage
+        tracemalloc.stop()
+
+    def test_rss(self):
+        assert current_rss() > 0
+
+
+class TestSoak:
+
+    def test_month_of_polling_keeps_rss_flat(self, monkeypatch, tmp_path):
+        import homework
+        from breaker import CircuitBreaker
+        from fingerprints import PayloadFingerprints
+        from governor import RequestGovernor
+        from health import HealthMonitor
+        from history import HistoryStore
+        from outbox import Outbox, OutboxDispatcher
+        from scheduler import PollScheduler
+        from state_table import StateTable
+        from templates import Templates
+
+        clock = FakeClock()
+        state = {'cycle': 0}
+
+        def fake_get(*args, **kwargs):
+            day, hour = divmod(state['cycle'] * RETRY_TIME, 24 * 60 * 60)
+            return FakeResponse({
+                'homeworks': [{
+                    'homework_name': f'hw{day}',
+                    'status': 'reviewing' if hour < 43200 else 'approved',
+                }],
+                'current_date': int(clock.now),
+            })
+
+        def bounded():
+            return BoundedCache(CACHE_SIZE, 3600, clock=clock)
+
+        monkeypatch.setattr(requests, 'get', fake_get)
+        monkeypatch.setattr(homework, 'TEMPLATES', Templates(cache=bounded()))
+        path = str(tmp_path / 'soak.sqlite3')
+        outbox = Outbox(path, clock=clock, states=bounded())
+        history = HistoryStore(path, clock=clock)
+        dispatcher = OutboxDispatcher(
+            outbox, lambda items: [True] * len(items)
+        )
+        breaker = CircuitBreaker(clock=clock)
+        fingerprints = PayloadFingerprints(bounded())
+        governor = RequestGovernor(1, 5, clock=clock, sleep=clock.sleep)
+        monitor = HealthMonitor(RETRY_TIME, clock=clock)
+        table = StateTable(homework.HOMEWORK_STATUSES)
+        scheduler = PollScheduler(
+            RETRY_TIME, RETRY_TIME // 2, clock=clock,
+            on_schedule=homework.track_schedule(table, monitor)
+        )
+        tenants = [str(number) for number in range(TENANTS)]
+        homework.restore_schedule(table, scheduler, tenants, 0)
+
+        pipeline = homework.Pipeline(
+            outbox, history, dispatcher, scheduler, table, monitor, breaker,
+            fingerprints, governor
+        )
+        errors = []
+
+        def report(tenant, error):
+            if error is not None:
+                errors.append(error)
+
+        cycles = MONTH // RETRY_TIME
+        baseline = None
+        for state['cycle'] in range(cycles):
+            skipped = homework.run_due_polls(pipeline, report)
+            assert skipped == 0, 'Опросы не должны пропускаться'
+            dispatcher.dispatch()
+            clock.now += RETRY_TIME
+            if state['cycle'] == cycles // 10:
+                gc.collect()
+                baseline = current_rss()
+        gc.collect()
+        growth = current_rss() - baseline
+        assert growth < RSS_GROWTH_LIMIT, (
+            f'RSS вырос на {growth // 1024} КБ за месяц работы'
+        )
+        assert not errors, errors
+        assert scheduler.metrics()['executed'] == cycles * TENANTS
+        assert outbox.stats()['depth'] == 0
+        assert monitor.status()['healthy']
+        for name, cache in (
+            ('outbox', outbox.states),
+            ('fingerprints', fingerprints.cache),
+            ('templates', homework.TEMPLATES.cache),
+        ):
+            assert len(cache) <= CACHE_SIZE, f'Кэш {name} вырос'
+        assert homework.TEMPLATES.cache.evictions > 0
+        assert len(governor.tenants) <= TENANTS
+        assert len(scheduler.queue) <= TENANTS, (
+            'В очереди планировщика не должны копиться устаревшие записи'
+        )
+        assert len(table) == TENANTS
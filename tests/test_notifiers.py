@@ -0,0 +1,189 @@
+import json
+import smtplib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import telegram
+
+from notifiers import (FanOut, Notifier, SmtpNotifier, TelegramNotifier,
+                       WebhookNotifier)
+
+
+class SlowNotifier(Notifier):
+
+    def __init__(self, name, delay, failures=0, **kwargs):
+        super().__init__(backoff=0, **kwargs)
+        self.name = name
+        self.delay = delay
+        self.failures = failures
+        self.messages = []
+
+    def deliver(self, message, key):
+        time.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('fail')
+        self.messages.append(message)
+
+
+class MockTelegramBot:
+
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+class MockSMTP:
+    sent = []
+
+    def __init__(self, host, port, timeout=None):
+        self.address = (host, port)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def send_message(self, email):
+        self.sent.append(email)
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    received = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.received.append((self.headers['Idempotency-Key'],
+                              json.loads(body)))
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestNotifiers:
+
+    def test_backends(self, monkeypatch):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), WebhookHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        monkeypatch.setattr(smtplib, 'SMTP', MockSMTP)
+        bot = MockTelegramBot()
+        fanout = FanOut([
+            TelegramNotifier(bot, 42),
+            WebhookNotifier(f'http://127.0.0.1:{server.server_port}/'),
+            SmtpNotifier('localhost', 25, 'bot@localhost', 'me@localhost'),
+        ])
+        try:
+            results = fanout.deliver([
+                (channel, 'text', f'key:{channel}')
+                for channel in fanout.channels
+            ])
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert results == [True, True, True]
+        assert bot.sent == [(42, 'text')]
+        assert WebhookHandler.received == [
+            ('key:webhook', {'text': 'text', 'idempotency_key': 'key:webhook'})
+        ]
+        email = MockSMTP.sent[-1]
+        assert email['To'] == 'me@localhost'
+        assert email.get_content().strip() == 'text'
+        assert fanout.metrics()['webhook']['sent'] == 1
+
+    def test_delivery_is_concurrent(self):
+        fanout = FanOut([SlowNotifier('a', 0.3), SlowNotifier('b', 0.3)])
+        started = time.monotonic()
+        assert fanout.deliver([('a', 'x', 'k'), ('b', 'x', 'k')]) == [
+            True, True
+        ]
+        assert time.monotonic() - started < 0.5, (
+            'Каналы должны получать сообщение одновременно'
+        )
+
+    def test_slow_backlog_does_not_delay_fast_channel(self):
+        finished = []
+
+        class FastNotifier(SlowNotifier):
+            def deliver(self, message, key):
+                super().deliver(message, key)
+                finished.append(time.monotonic())
+
+        slow = SlowNotifier('slow', 0.3, timeout=5, retries=0)
+        fanout = FanOut([slow, FastNotifier('fast', 0)])
+        items = []
+        for number in range(8):
+            items.append(('slow', 'x', f'slow{number}'))
+            items.append(('fast', 'x', f'fast{number}'))
+        started = time.monotonic()
+        assert all(fanout.deliver(items))
+        assert len(finished) == 8
+        assert max(finished) - started < 0.2, (
+            'Очередь к медленному каналу не должна задерживать быстрый'
+        )
+        fanout.shutdown()
+
+    def test_slow_backend_times_out(self):
+        fast = SlowNotifier('fast', 0)
+        slow = SlowNotifier('slow', 1, timeout=0.1, retries=0)
+        fanout = FanOut([fast, slow])
+        started = time.monotonic()
+        results = fanout.deliver([('slow', 'x', 'k'), ('fast', 'x', 'k')])
+        assert time.monotonic() - started < 0.5
+        assert results == [False, True]
+        fanout.shutdown()
+
+    def test_late_delivery_is_not_repeated(self):
+        release = threading.Event()
+
+        class StuckNotifier(SlowNotifier):
+            def deliver(self, message, key):
+                release.wait(5)
+                super().deliver(message, key)
+
+        stuck = StuckNotifier('stuck', 0, timeout=0.1, retries=0)
+        fanout = FanOut([stuck])
+        assert fanout.deliver([('stuck', 'x', 'k')]) == [False]
+        assert fanout.deliver([('stuck', 'x', 'k')]) == [False], (
+            'Повтор не должен ждать и запускать вторую отправку, '
+            'пока первая не завершилась'
+        )
+        release.set()
+        fanout.shutdown()
+        assert fanout.deliver([('stuck', 'x', 'k')]) == [True], (
+            'Опоздавшая доставка должна засчитываться при повторе'
+        )
+        assert stuck.messages == ['x'], 'Сообщение не должно дублироваться'
+        assert fanout.late == {}
+
+    def test_retries_and_metrics(self):
+        notifier = SlowNotifier('a', 0, failures=2, retries=2)
+        assert notifier.send('x', 'k')
+        metrics = notifier.metrics.as_dict()
+        assert metrics['sent'] == 1
+        assert metrics['attempts'] == 3
+        notifier = SlowNotifier('b', 0, failures=5, retries=1)
+        assert not notifier.send('x', 'k')
+        assert notifier.metrics.as_dict()['failed'] == 1
+
+    def test_notifier_is_abstract(self):
+        with pytest.raises(TypeError):
+            Notifier()
+
+    def test_unknown_channel(self):
+        assert FanOut([]).deliver([('telegram', 'x', 'k')]) == [False]
+
+    def test_telegram_error_is_retried(self):
+        class FailingBot(MockTelegramBot):
+            def send_message(self, **kwargs):
+                raise telegram.error.NetworkError('down')
+
+        notifier = TelegramNotifier(FailingBot(), 42, retries=1, backoff=0)
+        assert not notifier.send('x', 'k')
+        assert notifier.metrics.as_dict()['attempts'] == 2
@@ -0,0 +1,84 @@
+from outbox import DELIVERY_FAILED, Outbox, OutboxDispatcher, make_key
+from utils import FakeClock
+
+
+class TestOutbox:
+    HOMEWORK = {
+        'id': 123,
+        'homework_name': 'hw123',
+        'status': 'approved',
+        'date_updated': '2020-02-13T14:40:57Z',
+    }
+
+    def test_record_saves_state_and_message(self, tmp_path):
+        outbox = Outbox(str(tmp_path / 'outbox.sqlite3'))
+        key = make_key('1', self.HOMEWORK, 'approved')
+        assert outbox.record('1', 'approved', 'text', key)
+        assert outbox.get_state('1') == 'approved'
+        assert outbox.stats()['depth'] == 1
+
+    def test_record_is_idempotent(self, tmp_path):
+        outbox = Outbox(str(tmp_path / 'outbox.sqlite3'))
+        key = make_key('1', self.HOMEWORK, 'approved')
+        outbox.record('1', 'approved', 'text', key)
+        assert not outbox.record('1', 'approved', 'text', key), (
+            'Повторная запись с тем же ключом не должна '
+            'создавать новое сообщение'
+        )
+        assert outbox.stats()['depth'] == 1
+
+    def test_failed_send_is_retried_with_backoff(self, tmp_path):
+        clock = FakeClock()
+        outbox = Outbox(str(tmp_path / 'outbox.sqlite3'), clock=clock)
+        outbox.record('1', 'approved', 'text', 'key')
+        results = [False, True]
+        sent = []
+
+        def deliver(items):
+            sent.extend(message for _, message, _ in items)
+            return [results.pop(0) for _ in items]
+
+        dispatcher = OutboxDispatcher(outbox, deliver)
+        assert dispatcher.dispatch() == 0
+        assert outbox.connection.execute(
+            'SELECT last_error FROM outbox'
+        ).fetchone()[0] == DELIVERY_FAILED, (
+            'Для неудачной доставки должна сохраняться причина'
+        )
+        assert dispatcher.dispatch() == 0, (
+            'Повторная отправка не должна происходить до истечения задержки'
+        )
+        clock.now += 60
+        assert outbox.stats()['oldest_age'] == 60
+        assert dispatcher.dispatch() == 1
+        assert sent == ['text', 'text']
+        assert outbox.stats() == {'depth': 0, 'oldest_age': 0.0}
+
+    def test_message_per_channel(self, tmp_path):
+        outbox = Outbox(str(tmp_path / 'outbox.sqlite3'),
+                        channels=('telegram', 'webhook'))
+        outbox.record('1', 'approved', 'text', 'key')
+        delivered = []
+
+        def deliver(items):
+            delivered.extend(items)
+            return [channel == 'telegram' for channel, _, _ in items]
+
+        assert OutboxDispatcher(outbox, deliver).dispatch() == 1
+        assert sorted(delivered) == [
+            ('telegram', 'text', 'key:telegram'),
+            ('webhook', 'text', 'key:webhook'),
+        ]
+        assert outbox.stats()['depth'] == 1, (
+            'Недоставленное в один канал сообщение не должно '
+            'повторно уходить в остальные'
+        )
+
+    def test_state_survives_reopen(self, tmp_path):
+        path = str(tmp_path / 'outbox.sqlite3')
+        outbox = Outbox(path)
+        outbox.record('1', 'reviewing', 'text', 'key')
+        outbox.close()
+        outbox = Outbox(path)
+        assert outbox.get_state('1') == 'reviewing'
+        assert outbox.stats()['depth'] == 1
@@ -0,0 +1,142 @@
+from health import HealthMonitor
+from scheduler import OVERLOAD_OFF, OVERLOAD_ON, PollScheduler
+from utils import FakeClock
+
+
+def simulate(overload_mode, poll_cost=10, tenants=100, active=5,
+             hours=6):
+    """Гоняет перегруженный планировщик, возвращает худший интервал
+    между опросами активных пользователей и сам планировщик."""
+    clock = FakeClock()
+    scheduler = PollScheduler(600, 300, overload_mode=overload_mode,
+                              clock=clock)
+    for number in range(tenants):
+        tenant = str(number)
+        scheduler.add(tenant)
+        scheduler.update(
+            tenant, 'reviewing' if number < active else 'approved', False
+        )
+    last_poll = {}
+    worst = 0
+    end = clock.now + hours * 3600
+    while clock.now < end:
+        for tenant in scheduler.due():
+            clock.now += poll_cost
+            if int(tenant) < active:
+                if tenant in last_poll:
+                    worst = max(worst, clock.now - last_poll[tenant])
+                last_poll[tenant] = clock.now
+            scheduler.complete(tenant)
+        clock.now += max(scheduler.sleep_time(), 1)
+    return worst, scheduler
+
+
+class TestPollScheduler:
+
+    def test_active_tenants_go_first(self):
+        clock = FakeClock()
+        scheduler = PollScheduler(600, 300, clock=clock)
+        for tenant, status in (('1', 'approved'), ('2', None),
+                               ('3', 'reviewing')):
+            scheduler.add(tenant)
+            scheduler.update(tenant, status, False)
+        assert scheduler.due() == ['3', '2', '1']
+
+    def test_recent_change_is_active(self):
+        clock = FakeClock()
+        scheduler = PollScheduler(600, 300, recent_window=3600, clock=clock)
+        scheduler.add('1')
+        scheduler.add('2')
+        scheduler.update('1', 'approved', True)
+        scheduler.update('2', 'rejected', False)
+        assert scheduler.due() == ['1', '2']
+
+    def test_overload_sheds_and_defers(self):
+        clock = FakeClock()
+        scheduler = PollScheduler(600, 300, defer_interval=60, clock=clock)
+        for tenant, status in (('1', 'approved'), ('2', 'rejected'),
+                               ('3', 'reviewing')):
+            scheduler.add(tenant, due=clock.now - 400)
+            scheduler.update(tenant, status, False)
+        assert scheduler.due() == ['3']
+        assert scheduler.metrics() == {
+            'overloaded': True, 'tenants': 3, 'executed': 0,
+            'deferred': 1, 'shed': 1,
+        }
+        assert scheduler.next_due('2') == clock.now + 60
+        assert scheduler.next_due('1') == clock.now + 600
+
+    def test_explicit_modes(self):
+        clock = FakeClock()
+        scheduler = PollScheduler(600, 300, overload_mode=OVERLOAD_ON,
+                                  clock=clock)
+        scheduler.add('1')
+        scheduler.update('1', 'approved', False)
+        assert scheduler.due() == []
+        scheduler = PollScheduler(600, 300, overload_mode=OVERLOAD_OFF,
+                                  clock=clock)
+        scheduler.add('1', due=clock.now - 10000)
+        scheduler.update('1', 'approved', False)
+        assert scheduler.due() == ['1']
+
+    def test_skips_are_capped(self):
+        clock = FakeClock()
+        scheduler = PollScheduler(600, 300, overload_mode=OVERLOAD_ON,
+                                  max_skips=2, clock=clock)
+        scheduler.add('1')
+        scheduler.update('1', 'approved', False)
+        polled = []
+        for _ in range(6):
+            polled.append(scheduler.due() == ['1'])
+            if polled[-1]:
+                scheduler.complete('1')
+            clock.now += 600
+        assert polled == [False, False, True, False, False, True], (
+            'При постоянной перегрузке пользователь не должен '
+            'пропускаться больше max_skips раз подряд'
+        )
+
+    def test_shed_polls_are_reported(self):
+        clock = FakeClock()
+        monitor = HealthMonitor(600, clock=clock)
+        scheduler = PollScheduler(600, 300, overload_mode=OVERLOAD_ON,
+                                  max_skips=10,
+                                  on_schedule=monitor.poll_planned,
+                                  clock=clock)
+        scheduler.add('1')
+        scheduler.update('1', 'approved', False)
+        for _ in range(5):
+            assert scheduler.due() == []
+            clock.now += 600
+        assert scheduler.metrics()['shed'] == 5
+        status = monitor.status()
+        assert status['healthy'], (
+            'Намеренно пропущенные опросы не должны считаться отставанием'
+        )
+        assert status['tenants']['1']['lag'] == 0
+
+    def test_complete_reschedules(self):
+        clock = FakeClock()
+        scheduler = PollScheduler(600, 300, clock=clock)
+        scheduler.add('1')
+        assert scheduler.due() == ['1']
+        assert scheduler.due() == []
+        scheduler.complete('1')
+        assert scheduler.sleep_time() == 600
+        scheduler.remove('1')
+        scheduler.complete('1')
+        assert scheduler.metrics()['tenants'] == 0
+
+    def test_active_latency_holds_under_saturation(self):
+        worst_off, scheduler_off = simulate(OVERLOAD_OFF)
+        worst_auto, scheduler = simulate('auto')
+        assert worst_auto <= 600 + 300, (
+            'При перегрузке активные пользователи должны опрашиваться '
+            'без отставания'
+        )
+        assert worst_auto <= worst_off
+        assert scheduler.metrics()['shed'] > 0
+        assert scheduler.metrics()['executed'] < (
+            scheduler_off.metrics()['executed']
+        ), 'При перегрузке опросы неактивных пользователей сбрасываются'
+
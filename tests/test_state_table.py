@@ -0,0 +1,102 @@
+import pytest
+
+from state_table import ALIGN, StateTable, tenant_id
+
+STATUSES = ('approved', 'reviewing', 'rejected')
+
+
+class TestStateTable:
+
+    def test_rows_are_sorted_and_coded(self):
+        table = StateTable(STATUSES)
+        for number in (5, -3, 9):
+            table.add(number, 'reviewing', cursor=100 + number)
+        table.set_status(9, 'approved')
+        table.set_next_poll(5, 1.5)
+        assert [row[0] for row in table.rows()] == [-3, 5, 9]
+        assert table.get(9) == ('approved', 109, 0.0)
+        assert table.get(5) == ('reviewing', 105, 1.5)
+        assert table.get(4) is None
+        assert list(table.status_codes) == [2, 2, 1], (
+            'Статусы должны храниться кодами по порядку HOMEWORK_STATUSES'
+        )
+
+    def test_snapshot_is_mapped(self, tmp_path):
+        path = str(tmp_path / 'state')
+        table = StateTable(STATUSES)
+        table.add(1, 'rejected', cursor=10, next_poll=20.0)
+        table.add(2)
+        table.snapshot(path)
+        loaded = StateTable.load(path, STATUSES)
+        assert loaded.mapped is not None
+        assert isinstance(loaded.tenants, memoryview)
+        assert list(loaded.rows()) == [
+            (1, 'rejected', 10, 20.0), (2, None, 0, 0.0)
+        ]
+        loaded.set_status(2, 'approved')
+        assert StateTable.load(path, STATUSES).get(2)[0] is None, (
+            'Изменения не должны попадать в файл до snapshot()'
+        )
+        loaded.snapshot(path)
+        assert StateTable.load(path, STATUSES).get(2)[0] == 'approved'
+        loaded.add(0)
+        assert loaded.mapped is None
+        assert [row[0] for row in loaded.rows()] == [0, 1, 2]
+        loaded.close()
+
+    def test_columns_are_aligned(self, tmp_path):
+        path = tmp_path / 'state'
+        table = StateTable(STATUSES)
+        for number in range(3):
+            table.add(number)
+        table.snapshot(str(path))
+        row_size = 8 + 8 + 8 + 1
+        offset = path.stat().st_size - len(table) * row_size
+        assert offset % ALIGN == 0, (
+            'Колонки q и d в снимке должны начинаться с границы 8 байт'
+        )
+
+    def test_statuses_mismatch(self, tmp_path):
+        path = str(tmp_path / 'state')
+        StateTable(STATUSES).snapshot(path)
+        with pytest.raises(ValueError):
+            StateTable.load(path, STATUSES[:2])
+
+    def test_tenant_id(self):
+        assert tenant_id('12345') == 12345
+        assert tenant_id('-100') == -100
+        assert tenant_id('@channel') == tenant_id('@channel')
+        assert tenant_id('@channel') != tenant_id('@other')
+
+    def test_cursor_follows_current_date(self, tmp_path):
+        import homework
+        from history import HistoryStore
+        from outbox import Outbox
+
+        path = str(tmp_path / 'db.sqlite3')
+        outbox, history = Outbox(path), HistoryStore(path)
+        table = StateTable(homework.HOMEWORK_STATUSES)
+        table.add(42, cursor=100)
+        response = {
+            'homeworks': [{'homework_name': 'hw1', 'status': 'reviewing'}],
+            'current_date': 200,
+        }
+        homework.process_answer(outbox, history, '42', response, table)
+        assert table.get(42)[1] == 200
+        homework.process_answer(
+            outbox, history, '42', {'homeworks': [], 'current_date': 300},
+            table
+        )
+        assert table.get(42)[1] == 300, (
+            'Курсор from_date должен сдвигаться после каждого ответа API'
+        )
+        with pytest.raises(KeyError):
+            homework.process_answer(
+                outbox, history, '42',
+                {'homeworks': [{'homework_name': 'hw1', 'status': 'x'}],
+                 'current_date': 400},
+                table
+            )
+        assert table.get(42)[1] == 300, (
+            'Курсор не должен сдвигаться, если ответ не обработан'
+        )
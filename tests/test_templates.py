@@ -0,0 +1,77 @@
+from templates import Templates, compile_template
+
+
+class TestTemplates:
+
+    def test_homework_statuses_come_from_ru(self):
+        import homework
+
+        assert homework.HOMEWORK_STATUSES == (
+            homework.TEMPLATES.verdicts['ru']
+        )
+        assert set(Templates().verdicts['en']) == set(
+            homework.HOMEWORK_STATUSES
+        ), 'Для каждого языка нужны вердикты всех статусов'
+
+    def test_compile_template(self):
+        parts = compile_template('"{homework_name}". {verdict}',
+                                 'homework_name', verdict='Ура!')
+        assert parts == ['"', '". Ура!']
+
+    def test_render_status(self):
+        templates = Templates()
+        assert templates.render_status('hw1', 'approved') == (
+            'Изменился статус проверки работы "hw1". '
+            'Работа проверена: ревьюеру всё понравилось. Ура!'
+        )
+        assert templates.render_status('hw1', 'rejected', 'en') == (
+            'The review status of "hw1" has changed. '
+            'The work has been reviewed: the reviewer has comments.'
+        )
+
+    def test_rendered_messages_are_cached(self):
+        templates = Templates()
+        first = templates.render_status('hw1', 'reviewing', 'en')
+        assert templates.render_status('hw1', 'reviewing', 'en') is first
+        assert ('en', 'hw1', 'reviewing') in templates.cache
+
+    def test_unknown_locale_falls_back(self):
+        templates = Templates()
+        assert templates.render_status('hw1', 'reviewing', 'de') == (
+            templates.render_status('hw1', 'reviewing', 'ru')
+        )
+        assert templates.render_error('boom', 'de') == (
+            'Сбой в работе программы: boom'
+        )
+        assert templates.render_recovery('en') == 'The bot is working again.'
+
+    def test_resolve_locales(self, caplog):
+        templates = Templates()
+        resolved = templates.resolve_locales({'1': 'en', '2': 'de'})
+        assert resolved == {'1': 'en', '2': 'ru'}
+        assert len(caplog.records) == 1
+        caplog.clear()
+        for tenant in resolved.values():
+            templates.render_error('boom', tenant)
+            templates.render_recovery(tenant)
+        assert not caplog.records, (
+            'Проверенные языки не должны вызывать предупреждений'
+        )
+
+    def test_tenant_locale(self, monkeypatch, tmp_path):
+        import homework
+        from history import HistoryStore
+        from outbox import Outbox
+
+        monkeypatch.setattr(homework, 'TENANT_LOCALES', {'42': 'en'})
+        path = str(tmp_path / 'db.sqlite3')
+        outbox = Outbox(path)
+        response = {
+            'homeworks': [{'homework_name': 'hw1', 'status': 'approved'}],
+            'current_date': 0,
+        }
+        homework.process_answer(outbox, HistoryStore(path), '42', response)
+        message = outbox.connection.execute(
+            'SELECT message FROM outbox'
+        ).fetchone()[0]
+        assert message.startswith('The review status of "hw1"')
@@ -1,3 +1,5 @@
+import json
+from http import HTTPStatus
 from inspect import signature
 from types import ModuleType
 
@@ -37,3 +39,31 @@ def check_default_var_exists(scope: ModuleType, var_name: str) -> None:
         f'{var_name} должна быть переменной, а не функцией.'
     )
 
+
+class FakeClock:
+    """Часы для тестов: время идет только по команде."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeResponse:
+    """Ответ requests с телом JSON, кодом и заголовками."""
+
+    def __init__(self, data=None, status_code=HTTPStatus.OK, headers=None,
+                 etag=None):
+        self.data = data
+        self.status_code = status_code
+        self.content = json.dumps(data).encode() if data is not None else b''
+        self.headers = dict(headers or {})
+        if etag:
+            self.headers['ETag'] = etag
+
+    def json(self):
+        return self.data